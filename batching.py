@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Coalesce scoring requests from concurrent callers into shared batches.
+
+    A background thread takes the first waiting request, keeps pulling
+    requests until `max_batch_size` texts are collected or `max_wait_ms` has
+    passed, runs `score_fn` once on the combined texts and hands each caller
+    its own slice of the result. `score_fn` takes a list of texts and returns
+    a tuple of arrays aligned with it. A request may bring its own
+    `score_fn`; only requests with the same function share a batch.
+    `concurrency` background threads run, so at most that many scoring calls
+    are ever in flight, whichever function they use.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=10, concurrency=1):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"micro-batcher-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, texts, score_fn=None):
+        """Queue `texts` and return a Future for their slice of the batch result."""
+        future = Future()
+        self._queue.put((list(texts), future, time.perf_counter(), score_fn or self.score_fn))
+        return future
+
+    def score(self, texts, score_fn=None):
+        return self.submit(texts, score_fn).result()
+
+    def _collect(self, first=None):
+        """Requests for one batch, plus a request for another function that ended it (or None)."""
+        pending = [first or self._queue.get()]
+        score_fn = pending[0][3]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[3] is not score_fn:
+                return pending, item
+            pending.append(item)
+            size += len(item[0])
+        return pending, None
+
+    def _run(self):
+        held = None
+        while True:
+            pending, held = self._collect(held)
+            started = time.perf_counter()
+            texts = [text for item_texts, _, _, _ in pending for text in item_texts]
+            try:
+                results = pending[0][3](texts)
+            except Exception as e:
+                for _, future, _, _ in pending:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future, _, _ in pending:
+                end = offset + len(item_texts)
+                future.set_result(tuple(result[offset:end] for result in results))
+                offset = end
+
+            with self._stats_lock:
+                self._stats["requests"] += len(pending)
+                self._stats["texts"] += len(texts)
+                self._stats["batches"] += 1
+                waits = [started - queued for _, _, queued, _ in pending]
+                self._stats["wait_seconds"] += sum(waits)
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], *waits)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_texts"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_wait_ms"] = 1000 * stats["wait_seconds"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
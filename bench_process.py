@@ -0,0 +1,47 @@
+"""Helpers for benchmark scripts that measure each model in its own process.
+
+A child process loads one model, measures itself and puts its results on a
+queue; the parent waits for them with wait_for_result.
+"""
+import gc
+import queue
+import resource
+import time
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_mb():
+    """Current resident memory (VmRSS) after a garbage collection, in MB."""
+    gc.collect()
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_for_result(proc, results, timeout=None, poll_seconds=5):
+    """The item `proc` puts on `results`, or None if it dies or times out first.
+
+    A child killed mid-run (e.g. by the OOM killer) never puts anything, so
+    a bare results.get() would block forever.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            pass
+        if not proc.is_alive():
+            try:
+                # It may have put its result just before exiting
+                return results.get(timeout=1)
+            except queue.Empty:
+                return None
+        if deadline is not None and time.monotonic() > deadline:
+            proc.terminate()
+            return None
@@ -0,0 +1,140 @@
+"""Sentiment inference benchmark.
+
+Scores a fixed tweet sample and synthetic corpora of given token lengths
+across batch sizes, torch thread counts and every backend available here,
+bypassing the result cache. Each backend runs in its own process so peak RSS
+is attributable. Results are written as JSON for before/after comparisons.
+
+    python benchmark.py [--batch-sizes 1 8 32] [--seq-lengths 16 64 256] [--threads 1 4]
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import multiprocessing as mp
+import os
+import platform
+import time
+import numpy as np
+from bench_process import peak_rss_mb, wait_for_result
+from sample_tweets import sample_texts
+from sentiment import STUDENT_DIR, available_cores
+
+RESULTS_DIR = "bench_results"
+
+
+def available_backends():
+    backends = ["torch", "int8"]
+    if importlib.util.find_spec("onnxruntime") is not None:
+        backends.append("onnx")
+    if os.path.exists(STUDENT_DIR):
+        backends.append("student")
+    return backends
+
+
+def synthetic_corpus(tokenizer, seq_len, size, seed=0):
+    """`size` texts of exactly `seq_len` tokens (special tokens included)."""
+    rng = np.random.default_rng(seed)
+    words = " ".join(sample_texts()).split()
+    texts = []
+    for _ in range(size):
+        stream = " ".join(rng.choice(words, size=seq_len * 2))
+        ids = tokenizer(stream, add_special_tokens=False)['input_ids'][:seq_len - 2]
+        texts.append(tokenizer.decode(ids))
+    return texts
+
+
+def _time_batches(sm, texts, batch_size, batch_probs):
+    latencies = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        began = time.perf_counter()
+        batch_probs(sm, batch, batch_size=batch_size)
+        latencies.append(time.perf_counter() - began)
+    total = sum(latencies)
+    return {
+        "texts_per_sec": len(texts) / total,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+    }
+
+
+def _run_backend(backend, args, results):
+    import torch
+    from sentiment import get_model, _batch_probs
+    from text_clean import mask_texts
+
+    try:
+        sm = get_model(backend)
+    except Exception as e:
+        results.put((backend, {"error": str(e)}))
+        return
+
+    corpora = {"sample": mask_texts(sample_texts())}
+    for seq_len in args.seq_lengths:
+        corpora[f"synthetic_{seq_len}"] = synthetic_corpus(sm.tokenizer, seq_len, args.corpus_size)
+
+    rows = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for corpus, texts in corpora.items():
+            _batch_probs(sm, texts[:8])  # warm-up
+            for batch_size in args.batch_sizes:
+                row = {"backend": backend, "corpus": corpus, "threads": threads, "batch_size": batch_size}
+                row.update(_time_batches(sm, texts, batch_size, _batch_probs))
+                rows.append(row)
+                print(f"{backend:<8}{corpus:<15}threads={threads:<3}batch={batch_size:<4}"
+                      f"{row['texts_per_sec']:>9.1f} texts/s  p50 {row['p50_ms']:.1f}ms  p95 {row['p95_ms']:.1f}ms")
+
+    results.put((backend, {"rows": rows, "load_seconds": sm.load_seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    cores = available_cores()
+    parser = argparse.ArgumentParser(description="Benchmark sentiment inference")
+    parser.add_argument("--backends", nargs="+", default=None, help="default: all available")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32, 64])
+    parser.add_argument("--seq-lengths", nargs="+", type=int, default=[16, 64, 256])
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted({1, max(1, cores // 2), cores}))
+    parser.add_argument("--corpus-size", type=int, default=128)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds allowed per backend")
+    args = parser.parse_args()
+
+    backends = args.backends or available_backends()
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    report = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cores": cores,
+        "config": vars(args),
+        "backends": {},
+    }
+    for backend in backends:
+        proc = ctx.Process(target=_run_backend, args=(backend, args, results))
+        proc.start()
+        item = wait_for_result(proc, results, timeout=args.timeout)
+        proc.join()
+        if item is None:
+            # Killed (e.g. out of memory at a large batch) or over the time limit
+            item = (backend, {"error": f"process exited with code {proc.exitcode} before reporting"})
+        name, result = item
+        report["backends"][name] = result
+        if "error" in result:
+            print(f"{name}: skipped ({result['error']})")
+        else:
+            print(f"{name}: loaded in {result['load_seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Cascade sentiment scoring: a lexicon pass first, XLM-R only for ambiguous texts.
+
+Enable in the pipeline with SENTIMENT_CASCADE=1. Run
+`python cascade.py [reviews.csv]` to report escalation rate, agreement with
+the full model and end-to-end speedup on a CSV with a 'review' column
+(defaults to the fixed sample in sample_tweets.py).
+"""
+import os
+import re
+import threading
+import numpy as np
+from sentiment import LABELS, predict_sentiment_probs
+from text_clean import mask_text
+
+CASCADE = os.getenv("SENTIMENT_CASCADE", "0") == "1"
+# Lexicon results at or above this confidence are kept; the rest go to the model
+CASCADE_THRESHOLD = float(os.getenv("SENTIMENT_CASCADE_THRESHOLD", "0.8"))
+
+POSITIVE_WORDS = {
+    "thanks", "thank", "thankyou", "thx", "great", "excellent", "awesome", "amazing",
+    "love", "loving", "superb", "resolved", "appreciate", "appreciated", "kudos",
+    "helpful", "perfect", "smooth", "fantastic", "wonderful",
+}
+NEGATIVE_WORDS = {
+    "worst", "pathetic", "useless", "fraud", "scam", "horrible", "terrible", "disgusting",
+    "cheat", "cheated", "cheating", "frustrated", "ridiculous", "shameful", "waste",
+    "bad", "poor", "harassment", "looted",
+}
+# Any negation makes the lexicon unreliable ("not great", "never resolved")
+NEGATORS = {"not", "no", "never", "dont", "don't", "didnt", "didn't", "isnt", "isn't",
+            "wasnt", "wasn't", "nothing", "without"}
+POSITIVE_EMOJI = set("😀😃😄😁😊🙂😍🥰👍👏❤💯✅🎉")
+NEGATIVE_EMOJI = set("😡😠🤬😤😞😢😭👎💔😒🙄")
+
+WORD_RE = re.compile(r"[a-z']+")
+PLACEHOLDER_RE = re.compile(r"@user|http")
+
+# Words beyond this count leave room for nuance the lexicon can't see
+SHORT_TEXT_WORDS = 6
+# A single lexicon hit is too weak to skip the model ("great, machine down again")
+MIN_CONFIDENT_HITS = 2
+CONFIDENT, UNSURE = 0.9, 0.6
+
+_counts = {"texts": 0, "escalated": 0}
+_counts_lock = threading.Lock()
+
+
+def cascade_counts():
+    """Texts seen by the cascade in this process and how many went to the model."""
+    with _counts_lock:
+        counts = dict(_counts)
+    counts["escalation_rate"] = counts["escalated"] / counts["texts"] if counts["texts"] else 0.0
+    return counts
+
+
+def lexicon_label(text):
+    """(label, confidence) from word/emoji lexicons; confidence 0 means no opinion."""
+    text = PLACEHOLDER_RE.sub(" ", mask_text(str(text)).lower())
+    words = WORD_RE.findall(text)
+    positive = sum(word in POSITIVE_WORDS for word in words) + sum(ch in POSITIVE_EMOJI for ch in text)
+    negative = sum(word in NEGATIVE_WORDS for word in words) + sum(ch in NEGATIVE_EMOJI for ch in text)
+
+    if not text.strip():
+        return "neutral", CONFIDENT  # only handles and links
+    # Questions are mostly complaints ("when will my refund be resolved?")
+    if NEGATORS.intersection(words) or "?" in text or bool(positive) == bool(negative):
+        return "neutral", 0.0
+    confident = len(words) <= SHORT_TEXT_WORDS and positive + negative >= MIN_CONFIDENT_HITS
+    confidence = CONFIDENT if confident else UNSURE
+    return ("positive" if positive else "negative"), confidence
+
+
+def lexicon_probs(texts):
+    """(probs, confidence) arrays for the lexicon pass, probs shaped like the model's."""
+    probs = np.zeros((len(texts), len(LABELS)), dtype=np.float32)
+    confidence = np.zeros(len(texts), dtype=np.float32)
+    for i, text in enumerate(texts):
+        label, conf = lexicon_label(text)
+        confidence[i] = conf
+        if conf:
+            probs[i] = (1 - conf) / (len(LABELS) - 1)
+            probs[i, LABELS.index(label)] = conf
+        else:
+            probs[i] = 1 / len(LABELS)
+    return probs, confidence
+
+
+def predict_sentiment_cascade(texts, threshold=None, score_fn=predict_sentiment_probs):
+    """(n, 3) probabilities; the model (`score_fn`) only sees low-confidence texts."""
+    threshold = CASCADE_THRESHOLD if threshold is None else threshold
+    texts = list(texts)
+    probs, confidence = lexicon_probs(texts)
+
+    escalate = np.flatnonzero(confidence < threshold)
+    if len(escalate):
+        probs[escalate] = score_fn([texts[i] for i in escalate])
+
+    with _counts_lock:
+        _counts["texts"] += len(texts)
+        _counts["escalated"] += len(escalate)
+    return probs
+
+
+def _report(texts, labels=None):
+    import time
+    from sentiment import get_model, _batch_probs
+    from text_clean import mask_texts
+
+    # Score with the model directly so the result cache doesn't flatter either side
+    sm = get_model()
+    masked = mask_texts(texts)
+    _batch_probs(sm, masked[:8])  # warm-up
+
+    start = time.perf_counter()
+    full = _batch_probs(sm, masked)
+    full_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    probs, confidence = lexicon_probs(texts)
+    escalate = np.flatnonzero(confidence < CASCADE_THRESHOLD)
+    if len(escalate):
+        probs[escalate] = _batch_probs(sm, [masked[i] for i in escalate])
+    cascade_secs = time.perf_counter() - start
+
+    full_labels = full.argmax(axis=1)
+    cascade_labels = probs.argmax(axis=1)
+    kept = np.setdiff1d(np.arange(len(texts)), escalate)
+
+    print(f"Texts: {len(texts)}, threshold {CASCADE_THRESHOLD}")
+    print(f"Escalation rate: {len(escalate) / len(texts):.1%}")
+    print(f"Agreement with full model: {(full_labels == cascade_labels).mean():.1%} overall, "
+          f"{(full_labels[kept] == cascade_labels[kept]).mean() if len(kept) else 1:.1%} on lexicon-only texts")
+    print(f"Full model {full_secs:.2f}s, cascade {cascade_secs:.2f}s, speedup {full_secs / cascade_secs:.2f}x")
+    if labels is not None:
+        expected = np.array([LABELS.index(label) for label in labels])
+        print(f"Agreement with hand labels: full model {(full_labels == expected).mean():.1%}, "
+              f"cascade {(cascade_labels == expected).mean():.1%}")
+        for i in kept[cascade_labels[kept] != expected[kept]]:
+            print(f"  lexicon kept {LABELS[cascade_labels[i]]}, labelled {labels[i]}: {texts[i]!r}")
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        import pandas as pd
+        _report(pd.read_csv(sys.argv[1])['review'].astype(str).tolist())
+    else:
+        from sample_tweets import sample_texts, sample_labels
+        _report(sample_texts(), sample_labels())
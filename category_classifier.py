@@ -0,0 +1,360 @@
+"""Local comment categorizer: XLM-R embeddings plus a small trained head.
+
+The sentiment model's encoder embeds each comment (mean-pooled last layer)
+and a linear head trained on our LLM-labelled history picks one of
+report.CATEGORIES. predict_sentiment_and_category gets sentiment and category
+from the same encoder pass, skipping comments whose sentiment and category
+probabilities are both cached already. Comments the head is unsure about
+still go to Groq via report.categorize_comments unless
+CATEGORY_LLM_FALLBACK=0. Set CATEGORIZER=llm to skip the head entirely. When
+SENTIMENT_SERVICE_URL points at a scoring service the encoder isn't loaded
+in this process and comments are categorized by the LLM.
+
+    python category_classifier.py [--data cache/replies_30days.csv] [--epochs 300]
+
+trains the head, prints an accuracy report against the LLM labels on a
+held-out split and saves both in the local model directory.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import torch
+import torch.nn.functional as F
+from report import CATEGORIES, categorize_comments
+from sentiment import (MODEL, MODEL_DIR, BATCH_SIZE, GOVERNOR, get_model, get_cache, get_governor,
+                       _cache_key, _model_id, _batch_probs_and_embeddings)
+from text_clean import mask_texts
+
+CATEGORY_HEAD_PATH = os.path.join(MODEL_DIR, "category_head.pt")
+CATEGORY_REPORT_PATH = os.path.join(MODEL_DIR, "category_head_report.json")
+# "local" (head first, Groq for unsure comments) or "llm" (Groq only)
+CATEGORIZER = os.getenv("CATEGORIZER", "local")
+# Head predictions below this probability are sent to the LLM instead
+CATEGORY_MIN_CONFIDENCE = float(os.getenv("CATEGORY_MIN_CONFIDENCE", "0.6"))
+# With 0, unsure head predictions are kept too and categorization never calls Groq
+CATEGORY_LLM_FALLBACK = os.getenv("CATEGORY_LLM_FALLBACK", "1") == "1"
+# Embeddings always come from the fp32 torch model the head was trained on
+EMBEDDING_BACKEND = "torch"
+# Processes that score through the scoring service don't load the encoder themselves
+SENTIMENT_SERVICE_URL = os.getenv("SENTIMENT_SERVICE_URL")
+
+
+class CategoryHead(torch.nn.Module):
+    """Standardize an embedding, then one linear layer over CATEGORIES."""
+
+    def __init__(self, hidden_size, num_categories=len(CATEGORIES)):
+        super().__init__()
+        self.register_buffer("mean", torch.zeros(hidden_size))
+        self.register_buffer("std", torch.ones(hidden_size))
+        self.linear = torch.nn.Linear(hidden_size, num_categories)
+
+    def forward(self, embeddings):
+        return self.linear((embeddings - self.mean) / self.std)
+
+
+_head = None
+_head_id = None  # mtime/size of the head file _head was loaded from, or "missing"
+_head_lock = threading.Lock()
+
+_counts = {"texts": 0, "local": 0, "llm": 0}
+_counts_lock = threading.Lock()
+
+
+def _head_file_id():
+    # A retrained head gets a new mtime/size: it is reloaded and its cached predictions aren't reused
+    try:
+        stat = os.stat(CATEGORY_HEAD_PATH)
+    except OSError:
+        return "missing"
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def _load_category_head():
+    if not os.path.exists(CATEGORY_HEAD_PATH):
+        print(f"No category head in {CATEGORY_HEAD_PATH}; categorizing with the LLM. "
+              "Train one with `python category_classifier.py`")
+        return None
+    saved = torch.load(CATEGORY_HEAD_PATH)
+    if saved["categories"] != CATEGORIES or saved["model"] != MODEL:
+        print("Category head was trained for other categories or another encoder; "
+              "categorizing with the LLM until it is retrained")
+        return None
+    head = CategoryHead(saved["hidden_size"])
+    head.load_state_dict(saved["state_dict"])
+    return head.eval()
+
+
+def _current_head():
+    """(head or None, id of the head file it came from), reloading when the file changes."""
+    global _head, _head_id
+    head_id = _head_file_id()
+    with _head_lock:
+        if head_id != _head_id:
+            _head, _head_id = _load_category_head(), head_id
+        return _head, _head_id
+
+
+def get_category_head():
+    """Return the trained head, or None when none has been trained for this model.
+
+    The head file is checked on every call, so training one with
+    `python category_classifier.py` takes effect without a restart.
+    """
+    return _current_head()[0]
+
+
+def categorizer_counts():
+    """Comments categorized in this process, split by who decided."""
+    with _counts_lock:
+        counts = dict(_counts)
+    counts["llm_rate"] = counts["llm"] / counts["texts"] if counts["texts"] else 0.0
+    return counts
+
+
+def local_categorizer_enabled():
+    return CATEGORIZER == "local" and not SENTIMENT_SERVICE_URL and get_category_head() is not None
+
+
+def embed_texts(texts, batch_size=BATCH_SIZE):
+    return _batch_probs_and_embeddings(get_model(EMBEDDING_BACKEND), mask_texts(texts), batch_size)[1]
+
+
+def _head_probs(head, embeddings):
+    with torch.inference_mode():
+        return F.softmax(head(torch.from_numpy(embeddings)), dim=1).numpy()
+
+
+def _category_key(processed_text, model_id, head_id):
+    return hashlib.sha256(f"category-head:{head_id}:{model_id}\0{processed_text}".encode("utf-8")).hexdigest()
+
+
+def _head_pass(texts, with_sentiment, batch_size=BATCH_SIZE):
+    """(sentiment probs or None, category probs), encoding only comments missing from the cache.
+
+    Sentiment is always cached for the comments that do get encoded, since
+    the forward pass computes it anyway.
+    """
+    head, head_id = _current_head()
+    processed = mask_texts(texts)
+    unique = list(dict.fromkeys(processed))
+    cache = get_cache()
+    model_id = _model_id(EMBEDDING_BACKEND)
+    sentiment_keys = {text: _cache_key(text, EMBEDDING_BACKEND, model_id) for text in unique}
+    category_keys = {text: _category_key(text, model_id, head_id) for text in unique}
+    wanted = [*category_keys.values(), *(sentiment_keys.values() if with_sentiment else ())]
+    found = cache.get_many(wanted) if cache is not None else {}
+
+    missing = [text for text in unique if category_keys[text] not in found
+               or (with_sentiment and sentiment_keys[text] not in found)]
+    if missing:
+        sentiment, embeddings = _batch_probs_and_embeddings(get_model(EMBEDDING_BACKEND), missing, batch_size)
+        scored = {}
+        for text, s, c in zip(missing, sentiment, _head_probs(head, embeddings)):
+            scored[sentiment_keys[text]] = s.tolist()
+            scored[category_keys[text]] = c.tolist()
+        found.update(scored)
+        if cache is not None:
+            cache.set_many(scored)
+
+    categories = np.array([found[category_keys[text]] for text in processed], dtype=np.float32)
+    if not with_sentiment:
+        return None, categories
+    return np.array([found[sentiment_keys[text]] for text in processed], dtype=np.float32), categories
+
+
+# Governor score functions: each returns a tuple of arrays aligned with `texts`
+def _multitask_probs(texts):
+    return _head_pass(texts, with_sentiment=True)
+
+
+def _category_only_probs(texts):
+    return _head_pass(texts, with_sentiment=False)[1:]
+
+
+def _governed(score_fn, texts):
+    texts = [str(text) for text in texts]
+    if not GOVERNOR:
+        return score_fn(texts)
+    return get_governor().score(texts, score_fn=score_fn)
+
+
+def category_probs(texts):
+    """(n, len(CATEGORIES)) head probabilities aligned with `texts`.
+
+    Cached like sentiment and queued on the sentiment governor, so the
+    encoder pass never runs beside MAX_CONCURRENT scoring batches.
+    """
+    (probs,) = _governed(_category_only_probs, texts)
+    return probs
+
+
+def predict_sentiment_and_category(texts):
+    """(sentiment probs, category probs) for `texts` from one encoder pass per batch.
+
+    Sentiment probabilities match predict_sentiment_probs with the torch
+    backend and share its cache. The work is queued on the same governor as
+    governed_probs, so sessions never run more than MAX_CONCURRENT model
+    batches between them.
+    """
+    return _governed(_multitask_probs, texts)
+
+
+def route_categories(comments, probs, groq_api, min_confidence=None):
+    """Categories and sources ("local"/"llm") given head probabilities for `comments`.
+
+    The head decides wherever its top probability reaches `min_confidence`;
+    the remaining comments go to report.categorize_comments, or keep the
+    head's pick when CATEGORY_LLM_FALLBACK is off.
+    """
+    min_confidence = CATEGORY_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    if not CATEGORY_LLM_FALLBACK:
+        min_confidence = 0.0
+    comments = [str(comment) for comment in comments]
+    confident = probs.max(axis=1) >= min_confidence
+    categories = [CATEGORIES[k] if ok else None for k, ok in zip(probs.argmax(axis=1), confident)]
+    sources = ["local" if ok else "llm" for ok in confident]
+    return _finish_with_llm(comments, categories, sources, groq_api)
+
+
+def categorize_comments_local(comments, groq_api, min_confidence=None):
+    """Categories for `comments` and, per comment, "local" or "llm" for who chose it.
+
+    Uses the head when one is trained (see route_categories), otherwise the LLM.
+    """
+    comments = [str(comment) for comment in comments]
+    if local_categorizer_enabled() and comments:
+        return route_categories(comments, category_probs(comments), groq_api, min_confidence)
+    return _finish_with_llm(comments, [None] * len(comments), ["llm"] * len(comments), groq_api)
+
+
+def _finish_with_llm(comments, categories, sources, groq_api):
+    unsure = [i for i, category in enumerate(categories) if category is None]
+    if unsure:
+        for i, category in zip(unsure, categorize_comments([comments[i] for i in unsure], groq_api)):
+            categories[i] = category
+
+    with _counts_lock:
+        _counts["texts"] += len(comments)
+        _counts["local"] += len(comments) - len(unsure)
+        _counts["llm"] += len(unsure)
+    return categories, sources
+
+
+def load_training_data(path):
+    """(reviews, category indices) from a replies CSV, LLM-labelled rows only."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    df = df[df['category'].isin(CATEGORIES)]
+    if 'category_source' in df.columns:
+        # Rows cached before the head existed have no source and were all LLM-labelled
+        df = df[df['category_source'].fillna("llm") == "llm"]
+    df = df.dropna(subset=['review']).drop_duplicates(subset=['review'])
+    return df['review'].astype(str).tolist(), np.array([CATEGORIES.index(c) for c in df['category']])
+
+
+def train_head(embeddings, targets, epochs, lr, weight_decay):
+    x = torch.from_numpy(embeddings)
+    y = torch.from_numpy(targets)
+    head = CategoryHead(x.shape[1])
+    head.mean.copy_(x.mean(dim=0))
+    head.std.copy_(x.std(dim=0).clamp_min(1e-6))
+
+    # Inverse-frequency weights so rare categories aren't drowned out by "General"
+    counts = torch.bincount(y, minlength=len(CATEGORIES)).float()
+    class_weights = torch.where(counts > 0, counts.sum() / (len(CATEGORIES) * counts.clamp_min(1)), 0.0)
+
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    head.train()
+    for epoch in range(epochs):
+        loss = F.cross_entropy(head(x), y, weight=class_weights)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        if (epoch + 1) % 50 == 0:
+            print(f"Epoch {epoch + 1}/{epochs}: loss {loss.item():.4f}")
+    head.eval()
+    return head
+
+
+def accuracy_report(head, embeddings, targets, min_confidence):
+    """Agreement with the LLM labels, per category and at the routing threshold."""
+    with torch.inference_mode():
+        probs = F.softmax(head(torch.from_numpy(embeddings)), dim=1).numpy()
+    predicted = probs.argmax(axis=1)
+    confident = probs.max(axis=1) >= min_confidence
+
+    per_category = {}
+    for k, category in enumerate(CATEGORIES):
+        true_k, pred_k = targets == k, predicted == k
+        hits = int((true_k & pred_k).sum())
+        precision = hits / pred_k.sum() if pred_k.any() else 0.0
+        recall = hits / true_k.sum() if true_k.any() else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_category[category] = {"support": int(true_k.sum()), "precision": float(precision),
+                                  "recall": float(recall), "f1": float(f1)}
+
+    supported = [stats["f1"] for stats in per_category.values() if stats["support"]]
+    confusion = np.zeros((len(CATEGORIES), len(CATEGORIES)), dtype=int)
+    np.add.at(confusion, (targets, predicted), 1)
+    return {
+        "holdout_size": int(len(targets)),
+        "accuracy": float((predicted == targets).mean()),
+        "macro_f1": float(np.mean(supported)) if supported else 0.0,
+        "min_confidence": min_confidence,
+        # Share kept local at the threshold, and how often those agree with the LLM
+        "local_coverage": float(confident.mean()),
+        "local_accuracy": float((predicted[confident] == targets[confident]).mean()) if confident.any() else 0.0,
+        "per_category": per_category,
+        "confusion": {"labels": CATEGORIES, "matrix": confusion.tolist()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local comment category head")
+    parser.add_argument("--data", default=os.path.join("cache", "replies_30days.csv"))
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--lr", type=float, default=1e-2)
+    parser.add_argument("--weight-decay", type=float, default=1e-2)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--min-confidence", type=float, default=CATEGORY_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    texts, targets = load_training_data(args.data)
+    print(f"{len(texts)} LLM-labelled comments: "
+          + ", ".join(f"{c} {n}" for c, n in zip(CATEGORIES, np.bincount(targets, minlength=len(CATEGORIES)))))
+    print("Embedding comments...")
+    embeddings = embed_texts(texts)
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(texts))
+    n_holdout = max(1, int(len(texts) * args.holdout))
+    holdout, train = order[:n_holdout], order[n_holdout:]
+
+    head = train_head(embeddings[train], targets[train], args.epochs, args.lr, args.weight_decay)
+    report = accuracy_report(head, embeddings[holdout], targets[holdout], args.min_confidence)
+    print(f"Holdout accuracy vs LLM labels: {report['accuracy']:.1%}, macro F1 {report['macro_f1']:.3f}")
+    print(f"At confidence >= {args.min_confidence}: {report['local_coverage']:.1%} kept local, "
+          f"{report['local_accuracy']:.1%} of those agree with the LLM")
+    for category, stats in report["per_category"].items():
+        print(f"  {category:<18}support {stats['support']:<5}precision {stats['precision']:.2f}  "
+              f"recall {stats['recall']:.2f}  f1 {stats['f1']:.2f}")
+
+    # Ship a head trained on every labelled comment, not just the training split
+    head = train_head(embeddings, targets, args.epochs, args.lr, args.weight_decay)
+    # Write and rename, so a running app never loads a half-written head
+    partial_path = CATEGORY_HEAD_PATH + ".tmp"
+    torch.save({"state_dict": head.state_dict(), "categories": CATEGORIES, "model": MODEL,
+                "hidden_size": embeddings.shape[1]}, partial_path)
+    os.replace(partial_path, CATEGORY_HEAD_PATH)
+    report.update(data=args.data, epochs=args.epochs, training_size=len(texts))
+    with open(CATEGORY_REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Category head saved to {CATEGORY_HEAD_PATH}, report to {CATEGORY_REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
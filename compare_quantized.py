@@ -0,0 +1,100 @@
+"""Compare the fp32 and int8 sentiment models on the fixed labelled sample.
+
+Each variant runs in its own process so resident memory is measured for
+that model alone: steady-state RSS once it is loaded, plus the peak. The
+int8 weights are quantized in a separate process first, so the int8 run
+loads them from disk like a worker would. Run with
+`python compare_quantized.py [repeats]`.
+"""
+import multiprocessing as mp
+import os
+import sys
+import time
+import numpy as np
+from bench_process import peak_rss_mb, rss_mb, wait_for_result
+from sample_tweets import sample_texts, sample_labels
+
+VARIANTS = ["torch", "int8"]
+
+
+def _score_variant(backend, texts, repeats, results):
+    from sentiment import get_model, labels_from_probs, _batch_probs
+    from text_clean import mask_texts
+
+    # Score with the model directly so the result cache can't stand in for it
+    sm = get_model(backend)
+    loaded_rss = rss_mb()
+    masked = mask_texts(texts)
+    labels, scores = labels_from_probs(_batch_probs(sm, masked))
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        _batch_probs(sm, masked)
+    elapsed = time.perf_counter() - start
+
+    results.put((backend, {
+        "labels": list(labels),
+        "scores": scores.tolist(),
+        "texts_per_sec": len(texts) * repeats / elapsed,
+        "rss_mb": loaded_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def _prepare_int8():
+    from sentiment import get_model
+
+    get_model("int8")
+
+
+def compare(repeats=5):
+    from sentiment import QUANTIZED_PATH
+
+    texts = sample_texts()
+    gold = np.array(sample_labels(), dtype=object)
+
+    ctx = mp.get_context("spawn")
+    if not os.path.exists(QUANTIZED_PATH):
+        # Quantizing reads the fp32 model, which would swamp the int8 measurement
+        proc = ctx.Process(target=_prepare_int8)
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            sys.exit(f"int8: quantizing exited with code {proc.exitcode}")
+
+    results = ctx.Queue()
+    runs = {}
+    for backend in VARIANTS:
+        proc = ctx.Process(target=_score_variant, args=(backend, texts, repeats, results))
+        proc.start()
+        result = wait_for_result(proc, results)
+        proc.join()
+        if result is None:
+            sys.exit(f"{backend}: scoring process exited with code {proc.exitcode} before reporting")
+        name, run = result
+        runs[name] = run
+
+    fp32, int8 = runs["torch"], runs["int8"]
+    fp32_labels = np.array(fp32["labels"], dtype=object)
+    int8_labels = np.array(int8["labels"], dtype=object)
+    deltas = np.abs(np.array(fp32["scores"]) - np.array(int8["scores"]))
+
+    print(f"Sample size: {len(texts)} tweets, {repeats} timed passes per variant\n")
+    print(f"{'':<22}{'fp32':>12}{'int8':>12}")
+    print(f"{'Accuracy vs labels':<22}{(fp32_labels == gold).mean():>12.1%}{(int8_labels == gold).mean():>12.1%}")
+    print(f"{'Texts / sec':<22}{fp32['texts_per_sec']:>12.1f}{int8['texts_per_sec']:>12.1f}")
+    print(f"{'RSS after load (MB)':<22}{fp32['rss_mb']:>12.0f}{int8['rss_mb']:>12.0f}")
+    print(f"{'Peak RSS (MB)':<22}{fp32['peak_rss_mb']:>12.0f}{int8['peak_rss_mb']:>12.0f}")
+    print()
+    print(f"Label agreement fp32 vs int8: {(fp32_labels == int8_labels).mean():.1%}")
+    print(f"Score delta: mean {deltas.mean():.4f}, max {deltas.max():.4f}")
+    print(f"Speedup: {int8['texts_per_sec'] / fp32['texts_per_sec']:.2f}x, "
+          f"memory ratio after load: {int8['rss_mb'] / fp32['rss_mb']:.2f}")
+
+    for text, a, b in zip(texts, fp32_labels, int8_labels):
+        if a != b:
+            print(f"  disagreement: {text!r}: fp32={a} int8={b}")
+
+
+if __name__ == "__main__":
+    compare(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
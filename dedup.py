@@ -0,0 +1,150 @@
+"""Near-duplicate grouping of reviews with MinHash LSH.
+
+Texts are normalized by dedup_tokens (no links or handles, casefolded,
+punctuation dropped; digits, combining marks such as Devanagari vowel signs
+and emoji kept) and compared as token sets. MinHash
+signatures banded into LSH buckets find candidate pairs cheaply, and a text
+joins an earlier text's group when their word sets' Jaccard similarity is
+at least DEDUP_MIN_SIMILARITY and both carry the same negators, so "not
+resolved" never folds into "resolved". Texts with nothing left after
+normalization only group with identical raw text. Spam waves and
+copy-pasted complaints are then scored and categorized once.
+
+    python dedup.py reviews.csv
+
+prints the largest groups found in a CSV with a 'review' column.
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+import numpy as np
+from text_clean import URL_TOKEN_RE, USER_RE
+
+DEDUP = os.getenv("DEDUP", "1") == "1"
+DEDUP_MIN_SIMILARITY = float(os.getenv("DEDUP_MIN_SIMILARITY", "0.8"))
+# 16 bands of 2 rows: pairs above ~0.5 Jaccard almost always share a bucket
+NUM_BANDS, ROWS_PER_BAND = 16, 2
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+# Multiply-shift hash family; uint64 arithmetic wraps, which is what we want
+_rng = np.random.default_rng(0)
+_PERM_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+
+# Kept separate from cascade.NEGATORS so importing dedup doesn't load the model
+NEGATORS = frozenset({"not", "no", "never", "dont", "didnt", "doesnt", "isnt", "wasnt", "cant",
+                      "wont", "nothing", "without", "nahi", "nahin", "नहीं", "मत"})
+
+
+def _char_class(categories, limit=0x20000):
+    """Regex character class of the code points below `limit` whose Unicode category starts with one of `categories`."""
+    chars = [chr(c) for c in range(limit) if unicodedata.category(chr(c))[0] in categories]
+    return "".join(re.escape(c) for c in chars)
+
+
+# Words keep their combining marks (पैसा vs पैसे); every symbol, emoji
+# included, is a token of its own
+_TOKEN_RE = re.compile(rf"(?:\w|[{_char_class('M')}])+|[{_char_class('S')}]")
+# Apostrophes join contractions (don't -> dont); emoji variation selectors carry no meaning
+_DROP_RE = re.compile(r"['\u2019\ufe0e\ufe0f]")
+
+_counts = {"texts": 0, "groups": 0}
+_counts_lock = threading.Lock()
+
+
+def dedup_counts():
+    """Texts seen by group_near_duplicates in this process and how many groups they formed."""
+    with _counts_lock:
+        counts = dict(_counts)
+    counts["dedup_ratio"] = 1 - counts["groups"] / counts["texts"] if counts["texts"] else 0.0
+    return counts
+
+
+def dedup_tokens(text):
+    """Token set used to compare a text; empty when nothing but handles, links and punctuation remain."""
+    text = URL_TOKEN_RE.sub(' ', USER_RE.sub(' ', str(text)))
+    return frozenset(_TOKEN_RE.findall(_DROP_RE.sub('', text).casefold()))
+
+
+def _word_hash(word):
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(words):
+    """NUM_PERM-value MinHash signature of a non-empty set of words."""
+    hashes = np.array([_word_hash(word) for word in words], dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        permuted = hashes[:, None] * _PERM_A + _PERM_B
+    return (permuted >> np.uint64(32)).min(axis=0)
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def group_near_duplicates(texts, min_similarity=None):
+    """Group near-identical texts.
+
+    Returns (representatives, group): the index of the first text of each
+    group, in order of first appearance, and for every text the position of
+    its group in `representatives`. Results computed for the representatives
+    fan back out with `results[group]`.
+    """
+    min_similarity = DEDUP_MIN_SIMILARITY if min_similarity is None else min_similarity
+    texts = list(texts)
+    representatives = []
+    rep_words = []
+    group = np.zeros(len(texts), dtype=np.int64)
+    buckets = {}
+    exact = {}
+
+    for i, text in enumerate(texts):
+        words = dedup_tokens(text)
+        key = words if words else ("raw", str(text))
+        if key in exact:
+            group[i] = exact[key]
+            continue
+
+        match = None
+        band_keys = []
+        if words:
+            signature = minhash(words)
+            band_keys = [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes())
+                    for band in range(NUM_BANDS)]
+            candidates = {candidate for band_key in band_keys for candidate in buckets.get(band_key, ())}
+            # Earliest representative wins so grouping doesn't depend on set order
+            negators = words & NEGATORS
+            for candidate in sorted(candidates):
+                other = rep_words[candidate]
+                if other & NEGATORS == negators and _jaccard(words, other) >= min_similarity:
+                    match = candidate
+                    break
+
+        if match is None:
+            match = len(representatives)
+            representatives.append(i)
+            rep_words.append(words)
+            for band_key in band_keys:
+                buckets.setdefault(band_key, []).append(match)
+        exact[key] = match
+        group[i] = match
+
+    with _counts_lock:
+        _counts["texts"] += len(texts)
+        _counts["groups"] += len(representatives)
+    return representatives, group
+
+
+if __name__ == "__main__":
+    import sys
+    import pandas as pd
+
+    reviews = pd.read_csv(sys.argv[1])['review'].astype(str).tolist()
+    reps, groups = group_near_duplicates(reviews)
+    sizes = np.bincount(groups)
+    print(f"{len(reviews)} reviews, {len(reps)} groups, dedup ratio {1 - len(reps) / max(1, len(reviews)):.1%}")
+    for g in np.argsort(-sizes)[:10]:
+        if sizes[g] > 1:
+            print(f"{sizes[g]:>5}x  {reviews[reps[g]][:100]!r}")
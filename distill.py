@@ -0,0 +1,137 @@
+"""Distil the XLM-R sentiment model into a smaller student for high-volume backfills.
+
+The student keeps the teacher's embeddings, classifier head and an evenly
+spaced subset of its encoder layers, then is trained to match the teacher's
+probabilities on our cached reviews. Use it with SENTIMENT_BACKEND=student.
+
+    python distill.py [--data cache/replies_30days.csv] [--layers 4] [--epochs 3]
+
+A parity/accuracy report against the teacher is printed and saved as
+distill_report.json in the student directory.
+"""
+import argparse
+import copy
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from sentiment import get_model, _batch_probs, LABELS, STUDENT_DIR
+from sample_tweets import sample_texts, sample_labels
+from text_clean import mask_texts
+
+
+def build_student(teacher, num_layers):
+    """Copy of the teacher with only `num_layers` evenly spaced encoder layers."""
+    total = teacher.config.num_hidden_layers
+    keep = np.linspace(0, total - 1, num_layers).round().astype(int).tolist()
+
+    student = copy.deepcopy(teacher)
+    encoder = student.roberta.encoder
+    encoder.layer = torch.nn.ModuleList([encoder.layer[i] for i in keep])
+    student.config.num_hidden_layers = num_layers
+    print(f"Student keeps teacher layers {keep} of {total}")
+    return student
+
+
+def train(student, tokenizer, texts, teacher_probs, epochs, batch_size, lr, temperature, max_length):
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr)
+    # Soften the teacher distribution; log-probs stand in for its logits
+    targets = torch.softmax(torch.log(torch.from_numpy(teacher_probs).clamp_min(1e-8)) / temperature, dim=1)
+    rng = np.random.default_rng(0)
+
+    student.train()
+    for epoch in range(epochs):
+        order = rng.permutation(len(texts))
+        total_loss = 0.0
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            batch = tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                              max_length=max_length, return_tensors='pt')
+            logits = student(**batch).logits
+            loss = F.kl_div(F.log_softmax(logits / temperature, dim=1), targets[idx],
+                            reduction='batchmean') * temperature ** 2
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(idx)
+        print(f"Epoch {epoch + 1}/{epochs}: distillation loss {total_loss / len(texts):.4f}")
+    student.eval()
+
+
+def _throughput(sm, texts, repeats=3):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        _batch_probs(sm, texts)
+    return len(texts) * repeats / (time.perf_counter() - start)
+
+
+def report(teacher_sm, student_sm, holdout_texts, holdout_teacher_probs):
+    student_probs = _batch_probs(student_sm, holdout_texts)
+    sample = mask_texts(sample_texts())
+    gold = np.array(sample_labels(), dtype=object)
+    labels = np.array(LABELS, dtype=object)
+
+    teacher_speed = _throughput(teacher_sm, holdout_texts)
+    student_speed = _throughput(student_sm, holdout_texts)
+    result = {
+        "holdout_size": len(holdout_texts),
+        "holdout_agreement": float((student_probs.argmax(1) == holdout_teacher_probs.argmax(1)).mean()),
+        "holdout_mean_abs_prob_delta": float(np.abs(student_probs - holdout_teacher_probs).mean()),
+        "sample_accuracy_teacher": float((labels[_batch_probs(teacher_sm, sample).argmax(1)] == gold).mean()),
+        "sample_accuracy_student": float((labels[_batch_probs(student_sm, sample).argmax(1)] == gold).mean()),
+        "teacher_texts_per_sec": teacher_speed,
+        "student_texts_per_sec": student_speed,
+        "speedup": student_speed / teacher_speed,
+    }
+    for key, value in result.items():
+        print(f"{key:<32}{value:.4f}" if isinstance(value, float) else f"{key:<32}{value}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil the sentiment model into a smaller student")
+    parser.add_argument("--data", default=os.path.join("cache", "replies_30days.csv"))
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=5e-5)
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--holdout", type=float, default=0.1)
+    parser.add_argument("--output", default=STUDENT_DIR)
+    args = parser.parse_args()
+
+    texts = mask_texts(pd.read_csv(args.data)['review'].dropna().astype(str).unique())
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(texts))
+    n_holdout = max(1, int(len(texts) * args.holdout))
+    holdout = [texts[i] for i in order[:n_holdout]]
+    train_texts = [texts[i] for i in order[n_holdout:]]
+    print(f"{len(train_texts)} training texts, {len(holdout)} held out")
+
+    teacher_sm = get_model("torch")
+    print("Scoring with the teacher...")
+    train_probs = _batch_probs(teacher_sm, train_texts)
+    holdout_probs = _batch_probs(teacher_sm, holdout)
+
+    student = build_student(teacher_sm.model, args.layers)
+    train(student, teacher_sm.tokenizer, train_texts, train_probs, args.epochs,
+          args.batch_size, args.lr, args.temperature, args.max_length)
+
+    student_sm = type(teacher_sm)(student, teacher_sm.tokenizer, student.config)
+    result = report(teacher_sm, student_sm, holdout, holdout_probs)
+    result.update(layers=args.layers, epochs=args.epochs, temperature=args.temperature, data=args.data)
+
+    os.makedirs(args.output, exist_ok=True)
+    student.save_pretrained(args.output)
+    teacher_sm.tokenizer.save_pretrained(args.output)
+    with open(os.path.join(args.output, "distill_report.json"), "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Student saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,9 @@ import base64
 from io import BytesIO
 from collections import Counter
 import re
-from replies import get_all_replies_with_sentiment
-from report import generate_improvement_report
+from replies import get_all_replies_with_sentiment, derive_sentiment
+from report import generate_improvement_report, stream_cached_improvement_report, report_generated_at
+from text_clean import clean_joined
 import io
 import matplotlib.pyplot as plt
 from fpdf import FPDF
@@ -901,6 +902,12 @@ def main():
             - **Day of Week Analysis**: Which weekdays/weekends see better or worse sentiment.
             - **Competitor Trend**: Comparative positive‑sentiment trend lines for all companies.
             """)
+            # Labels are re-derived from the stored probabilities, so this is instant
+            min_confidence = st.slider(
+                "Minimum confidence",
+                min_value=0.0, max_value=0.9, value=0.0, step=0.05,
+                help="Comments whose most likely sentiment is below this probability are counted as neutral"
+            )
             # Create a top navigation bar
         col1, col2, col3, col4, col5 = st.columns([1, 3, 2, 1, 1])
         with col1:
@@ -923,7 +930,7 @@ def main():
                 st.rerun()
 
         with col4:
-            data = st.session_state.data
+            data = derive_sentiment(st.session_state.data, min_confidence)
             if 'improvement_report' not in st.session_state:
                 st.session_state.improvement_report = None
             
@@ -984,13 +991,14 @@ def main():
         </style>
         """, unsafe_allow_html=True)
         
-        # Get data
+        # Get data (label and score derived from the stored probabilities)
         data = st.session_state.data
         
         # Error handling
         if data is None or len(data) == 0:
             st.error("No data available for analysis. Please go back and try again.")
             return
+        data = derive_sentiment(data, min_confidence)
         
         # Ensure datetime format for 'at' column
         if 'at' in data.columns and not pd.api.types.is_datetime64_any_dtype(data['at']):
@@ -1886,18 +1894,9 @@ def main():
                 negative_comments = data[(data['sentiment'] == 'negative') & (data['source'] == 'PineLabs')]
                 
                 if len(negative_comments) > 0:
-                    # Join all text from negative comments - use 'review' column instead of 'text'
-                    all_text = ' '.join(negative_comments['review'].astype(str).fillna('').tolist())
-                    
-                    # Enhanced text cleaning
-                    # Remove URLs
-                    all_text = re.sub(r'http\S+', '', all_text)
-                    # Remove email addresses
-                    all_text = re.sub(r'\S*@\S*\s?', '', all_text)
-                    # Remove special characters and numbers
-                    all_text = re.sub(r'[^\w\s]', '', all_text)
-                    all_text = re.sub(r'\d+', '', all_text)
-                    all_text = all_text.lower()
+                    # Join and clean all text from negative comments (URLs, emails/handles,
+                    # special characters and numbers removed) - use 'review' column instead of 'text'
+                    all_text = clean_joined(negative_comments['review'])
                     
                     # Expanded stop words list
                     stop_words = set([
@@ -2418,12 +2417,13 @@ def main():
                             pine_data = compare_data[compare_data['source'] == 'PineLabs']
                             
                             if not pine_data.empty:
-                                # Get top 5 negative comments for PineLabs
+                                # Get all negative comments for PineLabs, most recent first; the report
+                                # summarizes them chunk by chunk when they don't fit one prompt
                                 # Using 'at' column for sorting if available, otherwise use index
                                 if 'at' in pine_data.columns:
-                                    pine_negative = pine_data[pine_data['sentiment'] == 'negative'].sort_values(by='at', ascending=False).head(5)
+                                    pine_negative = pine_data[pine_data['sentiment'] == 'negative'].sort_values(by='at', ascending=False)
                                 else:
-                                    pine_negative = pine_data[pine_data['sentiment'] == 'negative'].head(5)
+                                    pine_negative = pine_data[pine_data['sentiment'] == 'negative']
                                 
                                 # Prepare the negative comments for the improvement report
                                 # Use 'review' column if available, otherwise try 'text' column
@@ -2499,21 +2499,22 @@ def main():
                                 # Generate improvement report if function exists and we have negative comments
                                 if negative_comments:
                                     st.markdown("<h4>AI-Generated Improvement Recommendations</h4>", unsafe_allow_html=True)
+                                    # Reports are cached per set of comments and shared across sessions;
+                                    # reruns reuse them unless the user asks for a fresh one
+                                    regenerate_report = st.button("Regenerate recommendations", key="regenerate_report")
                                     
-                                    with st.spinner("Generating improvement recommendations..."):
+                                    # No spinner: the report streams in as Groq generates it
+                                    with st.container(border=True):
                                         try:
                                             # Check if generate_improvement_report function exists in the global namespace
                                             if 'generate_improvement_report' in globals():
-                                                # Call generate_improvement_report function with negative comments
-                                                improvement_report = generate_improvement_report(negative_comments,groq_api_key)
+                                                # Render the report progressively; write_stream returns the full text
+                                                improvement_report = st.write_stream(stream_cached_improvement_report(
+                                                    negative_comments, groq_api_key, regenerate=regenerate_report))
                                                 st.session_state.improvement_report = improvement_report
-
-                                                # Display the improvement report
-                                                st.markdown(f"""
-                                                <div style="background-color: #f5f5f5; padding: 20px; border-radius: 10px; margin-top: 20px;">
-                                                    {improvement_report}
-                                                </div>
-                                                """, unsafe_allow_html=True)
+                                                generated_at = report_generated_at(negative_comments)
+                                                if generated_at:
+                                                    st.caption(f"Generated {datetime.fromtimestamp(generated_at):%Y-%m-%d %H:%M}")
                                             else:
                                                 # Fallback to displaying the negative comments
                                                 st.warning("Improvement report generation function not available. Displaying negative comments instead.")
@@ -2524,7 +2525,7 @@ def main():
                                                     <ul>
                                                 """, unsafe_allow_html=True)
                                                 
-                                                for comment in negative_comments:
+                                                for comment in negative_comments[:5]:
                                                     st.markdown(f"<li>{comment}</li>", unsafe_allow_html=True)
                                                 
                                                 st.markdown("</ul></div>", unsafe_allow_html=True)
@@ -2539,7 +2540,7 @@ def main():
                                                 <ul>
                                             """, unsafe_allow_html=True)
                                             
-                                            for comment in negative_comments:
+                                            for comment in negative_comments[:5]:
                                                 st.markdown(f"<li>{comment}</li>", unsafe_allow_html=True)
                                             
                                             st.markdown("</ul></div>", unsafe_allow_html=True)
@@ -0,0 +1,33 @@
+"""Check that the ONNX backend gives the same labels and scores as torch.
+
+Run with `python onnx_parity.py`; exits non-zero on any mismatch.
+"""
+import sys
+import numpy as np
+from sentiment import get_model, labels_from_probs, _batch_probs
+from sample_tweets import sample_texts
+from text_clean import mask_texts
+
+SCORE_TOLERANCE = 1e-4
+
+
+def check_parity(texts, tolerance=SCORE_TOLERANCE):
+    # Run both models directly; cached results would compare an earlier run
+    masked = mask_texts(texts)
+    torch_labels, torch_scores = labels_from_probs(_batch_probs(get_model("torch"), masked))
+    onnx_labels, onnx_scores = labels_from_probs(_batch_probs(get_model("onnx"), masked))
+
+    label_mismatches = [i for i in range(len(texts)) if torch_labels[i] != onnx_labels[i]]
+    max_delta = float(np.max(np.abs(torch_scores - onnx_scores))) if len(texts) else 0.0
+
+    print(f"Texts checked: {len(texts)}")
+    print(f"Label mismatches: {len(label_mismatches)}")
+    print(f"Max score delta: {max_delta:.2e} (tolerance {tolerance:.0e})")
+    for i in label_mismatches:
+        print(f"  {texts[i]!r}: torch={torch_labels[i]} onnx={onnx_labels[i]}")
+
+    return not label_mismatches and max_delta <= tolerance
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_parity(sample_texts()) else 1)
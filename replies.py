@@ -1,13 +1,27 @@
 import time
+import numpy as np
 import pandas as pd
 import datetime
-from sentiment import predict_sentiment
-from report import categorize_comment
+from sentiment import (governed_probs, labels_from_probs, cache_stats, long_text_counts,
+                       stage_timings, governor_stats, PROB_COLUMNS, BACKEND, WORKERS)
+from cascade import CASCADE, predict_sentiment_cascade, cascade_counts
+from report import category_cache_stats
+from dedup import DEDUP, group_near_duplicates, dedup_counts
+from category_classifier import (EMBEDDING_BACKEND, categorize_comments_local, categorizer_counts,
+                                 local_categorizer_enabled, predict_sentiment_and_category, route_categories)
 import os
 import requests
 from dotenv import load_dotenv
 from pathlib import Path
 
+load_dotenv()
+
+# Optional local scoring service (see scoring_service.py); scored in-process when unset or unreachable
+SENTIMENT_SERVICE_URL = os.getenv("SENTIMENT_SERVICE_URL")
+
+# Probabilities and scores are written to the CSV cache with 4 decimals
+CACHE_FLOAT_FORMAT = "%.4f"
+
 # def get_playstore_reviews(past_days,source="PineLabs"):
 #     if source=="PineLabs":
 #         app_id="com.pinelabs.pinelabsone"
@@ -176,6 +190,101 @@ def get_twitter_comments(past_days,source,X_api):
 
 #     return df_combined
 
+def score_reviews(reviews):
+    """(n, 3) sentiment probabilities for a list of reviews, via the scoring service when configured."""
+    if SENTIMENT_SERVICE_URL:
+        try:
+            response = requests.post(f"{SENTIMENT_SERVICE_URL.rstrip('/')}/score",
+                                     json={"texts": reviews}, timeout=(5, 600))
+            response.raise_for_status()
+            return np.array(response.json()['probs'], dtype=np.float32).reshape(-1, len(PROB_COLUMNS))
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"Sentiment service unavailable ({e}), scoring in-process.")
+
+    # Scoring goes through the process-wide governor shared by all sessions
+    if CASCADE:
+        probs = predict_sentiment_cascade(reviews, score_fn=governed_probs)
+        print(f"Sentiment cascade: {cascade_counts()}")
+    else:
+        probs = governed_probs(reviews)
+    print(f"Sentiment cache: {cache_stats()}, long texts: {long_text_counts()}, stage seconds: {stage_timings()}")
+    print(f"Sentiment governor: {governor_stats()}")
+    return probs
+
+
+def enrich_reviews(reviews, groq_api):
+    """Sentiment probabilities, categories and category sources for a list of reviews.
+
+    With a trained category head and plain in-process torch scoring (no
+    cascade, other backend or worker pool) both come from one encoder pass;
+    otherwise sentiment and categorization run separately. With a scoring
+    service configured, categories come from the LLM. Near-duplicate reviews
+    are enriched once and share their group representative's results.
+    """
+    if DEDUP:
+        representatives, group = group_near_duplicates(reviews)
+        print(f"Dedup: {len(reviews)} reviews -> {len(representatives)} groups "
+              f"(ratio {1 - len(representatives) / max(1, len(reviews)):.1%}), this process: {dedup_counts()}")
+        probs, categories, sources = _enrich([reviews[i] for i in representatives], groq_api)
+        return probs[group], [categories[g] for g in group], [sources[g] for g in group]
+    return _enrich(reviews, groq_api)
+
+
+def _shared_pass_skipped_because():
+    """Why sentiment can't come from the category head's encoder pass, or None when it can."""
+    if CASCADE:
+        return "the sentiment cascade is enabled"
+    if BACKEND != EMBEDDING_BACKEND:
+        return f"SENTIMENT_BACKEND is {BACKEND}, the category head needs {EMBEDDING_BACKEND}"
+    if WORKERS > 1:
+        return f"SENTIMENT_WORKERS is {WORKERS}"
+    return None
+
+
+def _enrich(reviews, groq_api):
+    shared_pass = local_categorizer_enabled()
+    if shared_pass:
+        skipped_because = _shared_pass_skipped_because()
+        if skipped_because:
+            print(f"Scoring sentiment and categories in separate passes: {skipped_because}")
+            shared_pass = False
+
+    if shared_pass:
+        probs, category_probs = predict_sentiment_and_category(reviews)
+        print(f"Sentiment cache: {cache_stats()}, long texts: {long_text_counts()}, stage seconds: {stage_timings()}")
+        categories, sources = route_categories(reviews, category_probs, groq_api)
+    else:
+        probs = score_reviews(reviews)
+        categories, sources = categorize_comments_local(reviews, groq_api)
+    print(f"Categorizer: {categorizer_counts()}, category cache: {category_cache_stats()}")
+    return probs, categories, sources
+
+
+def derive_sentiment(df, min_confidence=0.0):
+    """Recompute 'sentiment' and 'score' from the stored probability columns.
+
+    Rows cached before probabilities were stored keep their original values.
+    """
+    if not set(PROB_COLUMNS).issubset(df.columns):
+        return df
+    has_probs = df[PROB_COLUMNS].notna().all(axis=1).to_numpy()
+    if not has_probs.any():
+        return df
+
+    df = df.copy()
+    labels, scores = labels_from_probs(df.loc[has_probs, PROB_COLUMNS].to_numpy(), min_confidence)
+    df.loc[has_probs, 'sentiment'] = labels
+    df.loc[has_probs, 'score'] = scores
+    return df
+
+
+def _compact_probs(df):
+    for column in PROB_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(np.float32)
+    return df
+
+
 def fetch_twitter_data(past_days, X_api, groq_api):
     """Helper to fetch data for all 4 sources for given number of days and process them."""
     df1 = get_twitter_comments(past_days, "PineLabs", X_api)
@@ -199,12 +308,13 @@ def fetch_twitter_data(past_days, X_api, groq_api):
     df_combined = df_combined.dropna(subset=['at'])
 
     # Apply sentiment & categorization
-    df_combined[['sentiment', 'score']] = df_combined['review'].apply(
-        lambda x: pd.Series(predict_sentiment(x))
-    )
-    df_combined[['category']] = df_combined['review'].apply(
-        lambda x: pd.Series(categorize_comment(x, groq_api)['predicted_category'])
-    )
+    # Keep the full probability vector so labels can be re-derived without the model
+    probs, categories, sources = enrich_reviews(df_combined['review'].astype(str).tolist(), groq_api)
+    df_combined[PROB_COLUMNS] = probs
+    df_combined['sentiment'], df_combined['score'] = labels_from_probs(probs)
+    # The local head categorizes what it is sure about; the LLM gets the rest.
+    # 'category_source' keeps head labels out of the head's own training data.
+    df_combined['category'], df_combined['category_source'] = categories, sources
 
     return df_combined
 
@@ -220,7 +330,7 @@ def get_all_replies_with_sentiment(X_api, groq_api, past_days=7):
     target_start_date = now - datetime.timedelta(days=past_days)
 
     if os.path.exists(full_cache_file):
-        df_30 = pd.read_csv(full_cache_file, parse_dates=["at"])
+        df_30 = _compact_probs(pd.read_csv(full_cache_file, parse_dates=["at"]))
         df_30 = df_30[df_30['at'] >= start_date]  # Ensure only last 30 days in cache
 
         latest_cache_date = df_30['at'].max()
@@ -233,11 +343,11 @@ def get_all_replies_with_sentiment(X_api, groq_api, past_days=7):
             df_30 = pd.concat([df_30, df_new], ignore_index=True)
             df_30.drop_duplicates(subset=["review", "at", "source"], inplace=True)
             df_30 = df_30[df_30['at'] >= start_date]  # Trim old data again
-            df_30.to_csv(full_cache_file, index=False)
+            df_30.to_csv(full_cache_file, index=False, float_format=CACHE_FLOAT_FORMAT)
     else:
         print("No existing 30-day cache. Fetching full 30-day data.")
         df_30 = fetch_twitter_data(30, X_api, groq_api)
-        df_30.to_csv(full_cache_file, index=False)
+        df_30.to_csv(full_cache_file, index=False, float_format=CACHE_FLOAT_FORMAT)
 
     # Filter from 30-day data
     df_filtered = df_30[df_30['at'] >= target_start_date]
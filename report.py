@@ -1,13 +1,139 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
 from langchain_core.output_parsers import StrOutputParser
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import groq
 import openai
 from dotenv import load_dotenv
+from cache_store import SQLiteCache
+from rate_limit import RateLimiter
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Groq quota for our API key, shared by every LLM call in this process
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+GROQ_MAX_ATTEMPTS = 5
+# Batched categorization requests in flight at once
+CATEGORIZE_CONCURRENCY = int(os.getenv("CATEGORIZE_CONCURRENCY", "4"))
+
+_groq_limiter = None
+_groq_limiter_lock = threading.Lock()
+
+
+def get_groq_limiter():
+    global _groq_limiter
+    with _groq_limiter_lock:
+        if _groq_limiter is None:
+            _groq_limiter = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+    return _groq_limiter
+
+
+def _retry_after_seconds(error, attempt):
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return 2 ** attempt  # no usable header: exponential backoff
+
+
+def invoke_rate_limited(chain, inputs, estimated_tokens):
+    """chain.invoke(inputs) within the Groq quota, honouring Retry-After on 429s.
+
+    `estimated_tokens` (prompt plus max completion) is charged against the
+    tokens-per-minute bucket before the request is sent.
+    """
+    limiter = get_groq_limiter()
+    for attempt in range(GROQ_MAX_ATTEMPTS):
+        limiter.acquire(estimated_tokens)
+        try:
+            return chain.invoke(inputs)
+        except groq.RateLimitError as e:
+            if attempt == GROQ_MAX_ATTEMPTS - 1:
+                raise
+            wait = _retry_after_seconds(e, attempt)
+            print(f"Groq rate limit hit, retrying in {wait:.1f}s")
+            limiter.pause(wait)
+
+
+CATEGORIES = ["Service related", "Device / POS", "Fee / Charges", "Payments related", "Settlement", "Enquiry", "General"]
+CATEGORIZE_MODEL = "llama3-70b-8192"
+# Persistent categorization cache; set CATEGORY_CACHE_PATH to an empty string to disable
+CATEGORY_CACHE_PATH = os.getenv("CATEGORY_CACHE_PATH", os.path.join("cache", "category_cache.sqlite"))
+CATEGORY_CACHE_MAX_ENTRIES = int(os.getenv("CATEGORY_CACHE_MAX_ENTRIES", "200000"))
+
+_category_cache = None
+
+
+def get_category_cache():
+    """Return the process-wide categorization cache, or None if disabled."""
+    global _category_cache
+    if _category_cache is None and CATEGORY_CACHE_PATH:
+        _category_cache = SQLiteCache(CATEGORY_CACHE_PATH, table="categories",
+                                      max_entries=CATEGORY_CACHE_MAX_ENTRIES)
+    return _category_cache
+
+
+def category_cache_stats():
+    cache = get_category_cache()
+    return cache.stats() if cache is not None else None
+
+
+CATEGORIZE_TEMPLATE = """
+You are an expert at categorizing user feedback into specific problem categories.
+
+Given the following fixed category list:
+[Service related, Device / POS, Fee / Charges, Payments related, Settlement, Enquiry, General]
+
+Your task is to select only one most appropriate category from this list for each user comment. Do not create or infer any new categories outside this list.
+
+Your response should contain only the selected category name, with no explanation or extra text.
+
+Sample Format:
+Sample Comment: I was charged twice but didn't receive confirmation.
+Response: Payments related
+
+Now, process the following comment accordingly:
+Comment: {comment}
+"""
+
+CATEGORIZE_BATCH_TEMPLATE = """
+You are an expert at categorizing user feedback into specific problem categories.
+
+Given the following fixed category list:
+[Service related, Device / POS, Fee / Charges, Payments related, Settlement, Enquiry, General]
+
+For each numbered user comment below, select only one most appropriate category from this list. Do not create or infer any new categories outside this list.
+
+Respond with only a JSON list containing one object per comment, in the form
+[{{"id": 1, "category": "Payments related"}}, {{"id": 2, "category": "General"}}]
+with no explanation or extra text.
+
+Comments:
+{comments}
+"""
+
+
+def _prompts_hash(*templates):
+    return hashlib.sha256("\0".join(templates).encode("utf-8")).hexdigest()[:16]
+
+
+# Editing either prompt or switching model changes every cache key
+_CATEGORIZE_PROMPTS_HASH = _prompts_hash(CATEGORIZE_TEMPLATE, CATEGORIZE_BATCH_TEMPLATE)
+
+
+def _category_key(comment):
+    # Entries from an older prompt or another model simply stop matching and age out
+    normalized = " ".join(str(comment).split()).casefold()
+    model_id = f"{CATEGORIZE_MODEL}:{_CATEGORIZE_PROMPTS_HASH}"
+    return hashlib.sha256(f"{model_id}\0{normalized}".encode("utf-8")).hexdigest()
+
+
 # def categorize_comment_1(comment):
 #     prompt = f"""
 # You are an expert at categorizing user feedback into specific problem categories.
@@ -40,46 +166,200 @@ load_dotenv()
 #     }
 
 def categorize_comment(comment,groq_api):
-    template = """
-You are an expert at categorizing user feedback into specific problem categories.
-
-Given the following fixed category list:
-[Service related, Device / POS, Fee / Charges, Payments related, Settlement, Enquiry, General]
-
-Your task is to select only one most appropriate category from this list for each user comment. Do not create or infer any new categories outside this list.
-
-Your response should contain only the selected category name, with no explanation or extra text.
-
-Sample Format:
-Sample Comment: I was charged twice but didn't receive confirmation.
-Response: Payments related
-
-Now, process the following comment accordingly:
-Comment: {comment}
-"""
+    cache = get_category_cache()
+    key = _category_key(comment)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return {"predicted_category": cached}
 
-    prompt = ChatPromptTemplate.from_template(template)
+    prompt = ChatPromptTemplate.from_template(CATEGORIZE_TEMPLATE)
 
     llm = ChatGroq(
-        model="llama3-70b-8192",  # You can change to llama-3-8b if needed
+        model=CATEGORIZE_MODEL,  # You can change to llama-3-8b if needed
         api_key=groq_api,
         temperature=0,
         max_tokens=50,
+        max_retries=0,  # 429s are retried by invoke_rate_limited
     )
 
     chain = prompt | llm | StrOutputParser()
 
-    result = chain.invoke({"comment": comment})
+    result = invoke_rate_limited(chain, {"comment": comment},
+                                 _estimate_tokens(CATEGORIZE_TEMPLATE + str(comment)) + 50)
 
+    category = result.strip()
+    # Only answers from the fixed list are worth reusing
+    if cache is not None and _normalize_category(category):
+        cache.set(key, category)
     return {
-        "predicted_category": result.strip()
+        "predicted_category": category
     }
 
 
-def generate_improvement_report(negative_comments,groq_api):
-    template = """
+# Rough prompt-token budget per batch request (about 4 characters per token)
+CATEGORIZE_TOKEN_BUDGET = 3000
+CATEGORIZE_MAX_BATCH = 50
+
+
+def _estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _token_batches(indices, comments, token_budget, max_batch):
+    """Split `indices` into batches whose comments fit the token budget."""
+    batch, used = [], 0
+    for i in indices:
+        cost = _estimate_tokens(comments[i]) + 8  # numbering and separators
+        if batch and (used + cost > token_budget or len(batch) >= max_batch):
+            yield batch
+            batch, used = [], 0
+        batch.append(i)
+        used += cost
+    if batch:
+        yield batch
+
+
+def _normalize_category(answer):
+    answer = str(answer).strip().strip('"').lower()
+    for category in CATEGORIES:
+        if answer == category.lower():
+            return category
+    return None
+
+
+def _parse_batch_answer(text, count):
+    """{position: category} for the well-formed items of a JSON answer."""
+    # raw_decode stops at the end of the list, ignoring any chatter after it;
+    # brackets in chatter before it ("[1]", "[see below]") are skipped until
+    # a list of objects decodes
+    decoder = json.JSONDecoder()
+    start = text.find("[")
+    while start >= 0:
+        try:
+            items, _ = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            items = None
+        if isinstance(items, list) and any(isinstance(item, dict) for item in items):
+            break
+        start = text.find("[", start + 1)
+    else:
+        return {}
+
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            position = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        category = _normalize_category(item.get("category", ""))
+        if 0 <= position < count and category:
+            parsed[position] = category
+    return parsed
+
+
+def categorize_comments(comments, groq_api, token_budget=CATEGORIZE_TOKEN_BUDGET,
+                        max_batch=CATEGORIZE_MAX_BATCH, max_retries=2,
+                        concurrency=CATEGORIZE_CONCURRENCY):
+    """Categorize many comments with a few batched LLM calls.
+
+    Comments are packed as a numbered list into prompts sized by
+    `token_budget`, and the model answers with a JSON list. Up to
+    `concurrency` batches are in flight at once, within the shared Groq rate
+    limits. Items that are missing or not in CATEGORIES are re-asked (in new
+    batches) up to `max_retries` times, then fall back to one
+    categorize_comment call each. Comments already in the categorization
+    cache are never sent, and each batch's answers are cached as soon as they
+    arrive, so a failed run doesn't pay for them again. Returns a list of category names aligned with
+    `comments`.
+    """
+    prompt = ChatPromptTemplate.from_template(CATEGORIZE_BATCH_TEMPLATE)
+    comments = [str(comment) for comment in comments]
+    categories = [None] * len(comments)
+
+    def categorize_batch(batch):
+        max_tokens = 20 * len(batch) + 50
+        llm = ChatGroq(
+            model=CATEGORIZE_MODEL,
+            api_key=groq_api,
+            temperature=0,
+            max_tokens=max_tokens,
+            max_retries=0,  # 429s are retried by invoke_rate_limited
+        )
+        chain = prompt | llm | StrOutputParser()
+        numbered = "\n".join(
+            f"{n}. {' '.join(comments[i].split())}" for n, i in enumerate(batch, 1)
+        )
+        answer = invoke_rate_limited(chain, {"comments": numbered},
+                                     _estimate_tokens(CATEGORIZE_BATCH_TEMPLATE + numbered) + max_tokens)
+        parsed = _parse_batch_answer(answer, len(batch))
+        for position, category in parsed.items():
+            categories[batch[position]] = category
+        if cache is not None:
+            cache.set_many({keys[batch[position]]: category for position, category in parsed.items()})
+
+    cache = get_category_cache()
+    keys = [_category_key(comment) for comment in comments]
+    cached = cache.get_many(set(keys)) if cache is not None else {}
+    for i, key in enumerate(keys):
+        categories[i] = cached.get(key)
+
+    # Identical comments are asked about once
+    first_of_key = {}
+    for i, key in enumerate(keys):
+        if categories[i] is None:
+            first_of_key.setdefault(key, i)
+    pending = list(first_of_key.values())
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for _ in range(max_retries + 1):
+            if not pending:
+                break
+            # list() re-raises the first failed batch, if any
+            list(pool.map(categorize_batch, _token_batches(pending, comments, token_budget, max_batch)))
+            pending = [i for i in pending if categories[i] is None]
+
+        fallback = pool.map(lambda i: categorize_comment(comments[i], groq_api)["predicted_category"], pending)
+        for i, category in zip(pending, fallback):
+            categories[i] = category
+
+    for i, key in enumerate(keys):
+        if categories[i] is None:
+            categories[i] = categories[first_of_key[key]]
+    return categories
+
+
+REPORT_MODEL = "llama-3.3-70b-versatile"
+REPORT_MAX_TOKENS = 400
+# Cached reports older than this are regenerated; shared by every session
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", str(6 * 3600)))
+REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", os.path.join("cache", "report_cache.sqlite"))
+# Comments beyond this many prompt tokens are summarized chunk by chunk first
+SUMMARY_CHUNK_TOKEN_BUDGET = int(os.getenv("SUMMARY_CHUNK_TOKEN_BUDGET", "2500"))
+# Chunks are at least this big; past it, a chunk ends after about one comment
+# in SUMMARY_CHUNK_AVG_COMMENTS (chosen by content hash)
+SUMMARY_CHUNK_MIN_TOKENS = SUMMARY_CHUNK_TOKEN_BUDGET // 2
+SUMMARY_CHUNK_AVG_COMMENTS = 10
+SUMMARY_MAX_TOKENS = 250
+# Chunk summaries requested at once, within the shared Groq rate limits
+REPORT_CONCURRENCY = int(os.getenv("REPORT_CONCURRENCY", "4"))
+
+_report_cache = None
+
+
+def get_report_cache():
+    """Return the process-wide improvement report cache, or None if disabled."""
+    global _report_cache
+    if _report_cache is None and REPORT_CACHE_PATH:
+        _report_cache = SQLiteCache(REPORT_CACHE_PATH, table="reports", max_entries=5000)
+    return _report_cache
+
+
+REPORT_TEMPLATE = """
     You are an expert AI specializing in customer feedback analysis and product improvement.
-    Generate a **concise and professional improvement report** based on the top 5 negative comments provided below.
+    Generate a **concise and professional improvement report** based on the negative comments provided below.
     
     ### **Negative Feedback Given**
     {negative_comments}
@@ -94,19 +374,247 @@ def generate_improvement_report(negative_comments,groq_api):
     "Customers frequently complain about slow transaction speeds and poor customer support. To address this, Pine Labs should optimize backend processing for faster payments and enhance support response times by introducing AI-based chat assistance..."
     """
 
+CHUNK_SUMMARY_TEMPLATE = """
+You are analysing a batch of negative customer comments about Pine Labs.
+
+List the distinct issues they raise, most frequent first. For each issue give a rough count of the comments mentioning it and one short representative quote. Use at most 8 bullet points, with no introduction or conclusion.
+
+Comments:
+{comments}
+"""
+
+MERGE_SUMMARY_TEMPLATE = """
+Below are issue lists, each summarizing a batch of negative customer comments about Pine Labs.
+
+Merge them into one list of distinct issues, most frequent first, adding up the counts of issues that are the same. Keep one short representative quote per issue. Use at most 10 bullet points, with no introduction or conclusion.
+
+Issue lists:
+{comments}
+"""
+
+REDUCE_TEMPLATE = """
+    You are an expert AI specializing in customer feedback analysis and product improvement.
+    Generate a **concise and professional improvement report** from the issue summaries below, which together cover {count} negative comments.
+    
+    ### **Issue Summaries**
+    {summaries}
+    
+    ### **Response Expectations**
+    - Summarize the key issues, weighting them by how often they occur.
+    - Suggest actionable improvements.
+    - Keep the response **brief (100-150 words)**.
+    - Maintain a professional but constructive tone.
+    
+    **Output Example**:
+    "Customers frequently complain about slow transaction speeds and poor customer support. To address this, Pine Labs should optimize backend processing for faster payments and enhance support response times by introducing AI-based chat assistance..."
+    """
+
+
+# Editing a template changes the key, so reports from the old prompts aren't reused
+_REPORT_PROMPTS_HASH = {
+    "direct": _prompts_hash(REPORT_TEMPLATE),
+    "hierarchical": _prompts_hash(CHUNK_SUMMARY_TEMPLATE, MERGE_SUMMARY_TEMPLATE, REDUCE_TEMPLATE),
+}
+
+
+def _report_key(negative_comments, mode):
+    model_id = f"{REPORT_MODEL}:{_REPORT_PROMPTS_HASH[mode]}:{REPORT_MAX_TOKENS}:{mode}"
+    payload = "\0".join([model_id, *[str(comment) for comment in negative_comments]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _report_chain(groq_api, template=REPORT_TEMPLATE, temperature=0.7, max_tokens=REPORT_MAX_TOKENS):
+    """prompt | llm | parser chain for one of the report prompts."""
     prompt = ChatPromptTemplate.from_template(template)
     llm = ChatGroq(
-        model="llama-3.3-70b-versatile",
+        model=REPORT_MODEL,
         api_key=groq_api,
-        temperature=0.7,
-        max_tokens=400
+        temperature=temperature,
+        max_tokens=max_tokens,
+        max_retries=0,  # 429s are retried by the rate limiter helpers
     )
+    return prompt | llm | StrOutputParser()
 
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({"negative_comments": "\n".join(negative_comments)})
+
+def _report_inputs(negative_comments):
+    comments = "\n".join(negative_comments)
+    return {"negative_comments": comments}, _estimate_tokens(REPORT_TEMPLATE + comments) + REPORT_MAX_TOKENS
+
+
+def generate_improvement_report(negative_comments,groq_api):
+    chain = _report_chain(groq_api)
+    inputs, estimated_tokens = _report_inputs(negative_comments)
+    response = invoke_rate_limited(chain, inputs, estimated_tokens)
     
     return response
 
 
+def _stream_rate_limited(chain, inputs, estimated_tokens):
+    limiter = get_groq_limiter()
+    for attempt in range(GROQ_MAX_ATTEMPTS):
+        limiter.acquire(estimated_tokens)
+        started = False
+        try:
+            for chunk in chain.stream(inputs):
+                started = True
+                yield chunk
+            return
+        except groq.RateLimitError as e:
+            # Text already shown can't be taken back, so only retry before the first chunk
+            if started or attempt == GROQ_MAX_ATTEMPTS - 1:
+                raise
+            wait = _retry_after_seconds(e, attempt)
+            print(f"Groq rate limit hit, retrying in {wait:.1f}s")
+            limiter.pause(wait)
+
+
+def stream_improvement_report(negative_comments, groq_api):
+    """Yield the report text in chunks as Groq streams them."""
+    inputs, estimated_tokens = _report_inputs(negative_comments)
+    yield from _stream_rate_limited(_report_chain(groq_api), inputs, estimated_tokens)
+
+
+def _content_defined_chunks(items, token_budget, min_tokens=SUMMARY_CHUNK_MIN_TOKENS,
+                            avg_items=SUMMARY_CHUNK_AVG_COMMENTS):
+    """Split `items` into chunks within `token_budget` at content-defined boundaries.
+
+    Once a chunk holds `min_tokens`, it ends after any item whose hash falls
+    in a 1-in-`avg_items` bucket, or earlier if the budget is reached.
+    Boundaries depend on the items themselves, not on their positions, so
+    adding or dropping items at either end of the list leaves the chunks in
+    the middle unchanged. The minimum keeps tiny chunks (each one a Groq
+    call) from appearing.
+    """
+    chunks, chunk, used = [], [], 0
+    for item in items:
+        cost = _estimate_tokens(item) + 2
+        if chunk and used + cost > token_budget:
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(item)
+        used += cost
+        if used >= min_tokens and int(hashlib.sha256(item.encode("utf-8")).hexdigest()[:8], 16) % avg_items == 0:
+            chunks.append(chunk)
+            chunk, used = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _summary_key(chunk, template):
+    # Independent of the final report prompt, so changing that keeps these
+    model_id = f"{REPORT_MODEL}:{SUMMARY_MAX_TOKENS}:{_prompts_hash(template)}"
+    payload = "\0".join([model_id, *chunk])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _summarize_chunk(chunk, groq_api, template):
+    """Issue summary of one chunk; cached without expiry since it is deterministic."""
+    cache = get_report_cache()
+    key = _summary_key(chunk, template)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached["report"], True
+
+    chain = _report_chain(groq_api, template, temperature=0, max_tokens=SUMMARY_MAX_TOKENS)
+    text = "\n".join(f"- {' '.join(item.split())}" for item in chunk)
+    summary = invoke_rate_limited(chain, {"comments": text},
+                                  _estimate_tokens(template + text) + SUMMARY_MAX_TOKENS)
+    if cache is not None:
+        cache.set(key, {"report": summary, "generated_at": time.time()})
+    return summary, False
+
+
+def _summarize_chunks(items, groq_api, template):
+    chunks = _content_defined_chunks(items, SUMMARY_CHUNK_TOKEN_BUDGET)
+    with ThreadPoolExecutor(max_workers=max(1, REPORT_CONCURRENCY)) as pool:
+        results = list(pool.map(lambda chunk: _summarize_chunk(chunk, groq_api, template), chunks))
+    cached = sum(hit for _, hit in results)
+    print(f"Report map step: {len(items)} items in {len(chunks)} chunks, "
+          f"{cached} cached, {len(chunks) - cached} summarized")
+    return [summary for summary, _ in results]
+
+
+def _fits_one_prompt(items):
+    return sum(_estimate_tokens(item) + 2 for item in items) <= SUMMARY_CHUNK_TOKEN_BUDGET
+
+
+def stream_hierarchical_report(negative_comments, groq_api):
+    """Yield a report over any number of comments, map-reduce style.
+
+    Comments are split into token-budgeted, content-defined chunks that are
+    summarized concurrently (each summary cached, so new data only costs its
+    new chunks). Summaries are merged the same way until they fit one prompt,
+    then the final report is streamed from them.
+    """
+    comments = [str(comment) for comment in negative_comments]
+    summaries = _summarize_chunks(comments, groq_api, CHUNK_SUMMARY_TEMPLATE)
+    while len(summaries) > 1 and not _fits_one_prompt(summaries):
+        summaries = _summarize_chunks(summaries, groq_api, MERGE_SUMMARY_TEMPLATE)
+
+    chain = _report_chain(groq_api, REDUCE_TEMPLATE)
+    joined = "\n\n".join(summaries)
+    yield from _stream_rate_limited(chain, {"count": len(comments), "summaries": joined},
+                                    _estimate_tokens(REDUCE_TEMPLATE + joined) + REPORT_MAX_TOKENS)
+
+
+def _report_mode(negative_comments):
+    # Few comments go into the report prompt as they are
+    return "direct" if _fits_one_prompt([str(comment) for comment in negative_comments]) else "hierarchical"
+
+
+def _cached_report(key):
+    cache = get_report_cache()
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None and time.time() - cached["generated_at"] < REPORT_CACHE_TTL_SECONDS:
+        return cached
+    return None
+
+
+def _store_report(key, report):
+    generated_at = time.time()
+    cache = get_report_cache()
+    if cache is not None:
+        cache.set(key, {"report": report, "generated_at": generated_at})
+    return generated_at
+
+
+def stream_cached_improvement_report(negative_comments, groq_api, regenerate=False):
+    """Yield the improvement report for these comments, reusing a fresh cached one.
+
+    Comments that fit one prompt get the direct report, more are summarized
+    with stream_hierarchical_report. A cached report is yielded in one
+    piece, otherwise the chunks as they arrive; the complete text is cached
+    once the stream finishes. Reports are keyed by the comments, model and
+    prompt version, kept for REPORT_CACHE_TTL_SECONDS and shared by every
+    session and process. Pass `regenerate=True` to replace the cached copy.
+    """
+    mode = _report_mode(negative_comments)
+    key = _report_key(negative_comments, mode)
+    cached = None if regenerate else _cached_report(key)
+    if cached is not None:
+        yield cached["report"]
+        return
+
+    stream = stream_improvement_report if mode == "direct" else stream_hierarchical_report
+    chunks = []
+    for chunk in stream(negative_comments, groq_api):
+        chunks.append(chunk)
+        yield chunk
+    _store_report(key, "".join(chunks))
+
+
+def cached_improvement_report(negative_comments, groq_api, regenerate=False):
+    """(report, generated_at); the non-streaming form of stream_cached_improvement_report."""
+    report = "".join(stream_cached_improvement_report(negative_comments, groq_api, regenerate))
+    return report, report_generated_at(negative_comments)
+
+
+def report_generated_at(negative_comments):
+    """When the cached report for these comments was generated, or None."""
+    cached = _cached_report(_report_key(negative_comments, _report_mode(negative_comments)))
+    return cached["generated_at"] if cached is not None else None
+
+
 
 # print(categorize_comment("@AnqFinance after 30 days I will complaint on RBI ombudsman for your non service response."))
\ No newline at end of file
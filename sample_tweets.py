@@ -0,0 +1,52 @@
+# Fixed, hand-labelled sample of replies used by the parity, comparison and
+# benchmark scripts. Handles and links are kept so preprocessing is exercised.
+SAMPLE_TWEETS = [
+    ("@PineLabs my settlement has been pending for 5 days, no one is responding", "negative"),
+    ("@PineLabs worst service ever, the POS machine stopped working again", "negative"),
+    ("@PineLabs refund my money, charged twice for a single transaction", "negative"),
+    ("@PineLabs why are you deducting extra charges every month without informing?", "negative"),
+    ("@Razorpay payment failed but amount debited from my account. Please help asap", "negative"),
+    ("@Paytm customer care is useless, raised 3 tickets and nothing happened", "negative"),
+    ("@PineLabs terminal keeps showing network error, losing customers because of this", "negative"),
+    ("@pinelabsonline still waiting for the engineer visit, this is ridiculous", "negative"),
+    ("@Razorpay your KYC process is a nightmare, rejected for the 4th time", "negative"),
+    ("@Paytm soundbox not announcing payments since yesterday https://t.co/abc123", "negative"),
+    ("@PineLabs hidden fees on every transaction, switching to another provider", "negative"),
+    ("@PineLabs no response on email or phone. Pathetic support", "negative"),
+    ("@PineLabs when will my refund be resolved?", "negative"),
+    ("@PineLabs great, machine down again", "negative"),
+    ("@Razorpay thanks for nothing, still no settlement", "negative"),
+    ("@Paytm is this what you call excellent service??", "negative"),
+    ("@PineLabs how do I update the bank account linked to my terminal?", "neutral"),
+    ("@PineLabs what is the settlement cycle for UPI payments?", "neutral"),
+    ("@Razorpay is there an API to fetch payout status in bulk?", "neutral"),
+    ("@Paytm please share the customer care number for merchants", "neutral"),
+    ("@PineLabs DM sent with the terminal ID", "neutral"),
+    ("@pinelabsonline I have shared the details over email", "neutral"),
+    ("@Razorpay does the payment gateway support international cards?", "neutral"),
+    ("@PineLabs ticket number 4589231 for reference", "neutral"),
+    ("@Paytm when will the new soundbox be available in Pune?", "neutral"),
+    ("@PineLabs https://t.co/xyz789", "neutral"),
+    ("@PineLabs which documents are required for onboarding a new store?", "neutral"),
+    ("@Razorpay following up on my previous tweet", "neutral"),
+    ("@PineLabs thanks for resolving my issue so quickly!", "positive"),
+    ("@PineLabs great support from your team today, settlement received", "positive"),
+    ("@Razorpay loving the new dashboard, very easy to use", "positive"),
+    ("@Paytm the soundbox works perfectly, thank you", "positive"),
+    ("@PineLabs the new terminal is fast and reliable 👍", "positive"),
+    ("@pinelabsonline kudos to the engineer who fixed our POS within an hour", "positive"),
+    ("@Razorpay smooth onboarding experience, highly recommended", "positive"),
+    ("@PineLabs thank you 🙏", "positive"),
+    ("@Paytm instant settlement is a game changer for my shop", "positive"),
+    ("@PineLabs excellent service as always", "positive"),
+    ("@Razorpay quick refund processed, appreciate it", "positive"),
+    ("@PineLabs issue resolved, thanks a lot for the follow up", "positive"),
+]
+
+
+def sample_texts():
+    return [text for text, _ in SAMPLE_TWEETS]
+
+
+def sample_labels():
+    return [label for _, label in SAMPLE_TWEETS]
@@ -0,0 +1,83 @@
+"""Local HTTP sentiment scoring service.
+
+One process holds the model and micro-batches requests from every Streamlit
+session and the ingestion job. Point replies.py at it with
+SENTIMENT_SERVICE_URL=http://127.0.0.1:8765
+
+    python scoring_service.py --port 8765 --max-batch-size 64 --max-wait-ms 10
+
+POST /score  {"texts": [...]}  ->  {"probs": [[neg, neu, pos], ...], "labels": [...], "scores": [...]}
+GET  /health                   ->  batching statistics
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from batching import MicroBatcher
+from sentiment import get_model, predict_sentiment_probs, labels_from_probs, BACKEND
+
+
+def make_handler(batcher):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(200, {"status": "ok", "backend": BACKEND, **batcher.stats()})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                texts = json.loads(self.rfile.read(length))["texts"]
+                if not isinstance(texts, list):
+                    raise ValueError("'texts' must be a list")
+            except (ValueError, KeyError) as e:
+                self._send_json(400, {"error": f"bad request: {e}"})
+                return
+
+            try:
+                (probs,) = batcher.score([str(text) for text in texts])
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            labels, scores = labels_from_probs(probs)
+            self._send_json(200, {
+                "probs": probs.tolist(),
+                "labels": list(labels),
+                "scores": [float(s) for s in scores],
+            })
+
+        def log_message(self, format, *args):
+            pass  # keep the console for model / batching output
+
+    return ScoringHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local micro-batching sentiment scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    # Load up front so the first request doesn't pay for it
+    get_model()
+    batcher = MicroBatcher(lambda texts: (predict_sentiment_probs(texts),), args.max_batch_size, args.max_wait_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher))
+    print(f"Sentiment scoring service listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,721 @@
+import hashlib
+import multiprocessing as mp
 import os
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, AutoConfig
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import torch
 import torch.nn.functional as F
+from dotenv import load_dotenv
+from batching import MicroBatcher
+from cache_store import SQLiteCache
+from text_clean import mask_text, mask_texts
 
 MODEL = "cardiffnlp/twitter-xlm-roberta-base-sentiment"
 MODEL_DIR = "./local_model"  # <-- Local directory to save/load
+SAFETENSORS_PATH = os.path.join(MODEL_DIR, "model.safetensors")
+ONNX_PATH = os.path.join(MODEL_DIR, "model.onnx")
+QUANTIZED_PATH = os.path.join(MODEL_DIR, "model_int8.pt")
+STUDENT_DIR = os.getenv("SENTIMENT_STUDENT_DIR", "./student_model")  # written by distill.py
+BATCH_SIZE = 32
+# Label order of the cardiffnlp model's classifier head (config.id2label)
+LABELS = ["negative", "neutral", "positive"]
+# DataFrame / cache CSV columns holding the per-label probabilities
+PROB_COLUMNS = [f"prob_{label}" for label in LABELS]
+
+# "torch" (default), "onnx", "int8" or "student"; read from the environment / .env file
+load_dotenv()
+BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")
+# Processes used by predict_sentiment_parallel (a pool kept for the life of the
+# process); 1 keeps scoring in-process
+WORKERS = int(os.getenv("SENTIMENT_WORKERS", "1"))
+# Persistent result cache; set SENTIMENT_CACHE_PATH to an empty string to disable
+CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", os.path.join("cache", "sentiment_cache.sqlite"))
+CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "200000"))
+# Inputs longer than MAX_LENGTH tokens are either truncated ("truncate") or
+# scored as overlapping windows whose probabilities are averaged ("chunk")
+MAX_LENGTH = int(os.getenv("SENTIMENT_MAX_LENGTH", "512"))
+LONG_TEXT_MODE = os.getenv("SENTIMENT_LONG_TEXT", "truncate")
+CHUNK_STRIDE = int(os.getenv("SENTIMENT_CHUNK_STRIDE", "64"))
+# Tokenize the next batch on a separate thread while the model runs the current one
+PIPELINE = os.getenv("SENTIMENT_PIPELINE", "0") == "1"
+PIPELINE_DEPTH = 2
+# Process-wide inference governor: at most MAX_CONCURRENT batches run at once,
+# and requests from concurrent sessions waiting meanwhile are merged
+GOVERNOR = os.getenv("SENTIMENT_GOVERNOR", "1") == "1"
+MAX_CONCURRENT = int(os.getenv("SENTIMENT_MAX_CONCURRENT", "1"))
+GOVERNOR_MAX_BATCH = int(os.getenv("SENTIMENT_GOVERNOR_MAX_BATCH", "256"))
+GOVERNOR_MAX_WAIT_MS = float(os.getenv("SENTIMENT_GOVERNOR_MAX_WAIT_MS", "5"))
+
+
+class SentimentModel:
+    """A loaded tokenizer/config/model triple plus how long it took to load."""
+
+    def __init__(self, model, tokenizer, config, load_seconds=None, load_timings=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.config = config
+        self.load_seconds = load_seconds
+        self.load_timings = load_timings or {}  # seconds per loading stage
+
+    def logits(self, batch):
+        return self.model(**batch).logits
+
+
+class OnnxSentimentModel(SentimentModel):
+    """Same interface as SentimentModel, but `model` is an onnxruntime session."""
+
+    def logits(self, batch):
+        feed = {inp.name: batch[inp.name].numpy() for inp in self.model.get_inputs()}
+        return torch.from_numpy(self.model.run(None, feed)[0])
+
+
+class _LogitsOnly(torch.nn.Module):
+    # ONNX export wants plain tensors out rather than a ModelOutput
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+@contextmanager
+def _timed(timings, stage):
+    start = time.perf_counter()
+    yield
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _convert_to_safetensors():
+    """Rewrite a local_model saved as pytorch_model.bin as model.safetensors."""
+    from transformers import AutoModelForSequenceClassification
+
+    legacy_path = os.path.join(MODEL_DIR, "pytorch_model.bin")
+    if not os.path.exists(legacy_path):
+        return
+    print("Converting local model weights to safetensors...")
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR, local_files_only=True)
+    model.save_pretrained(MODEL_DIR, safe_serialization=True)
+    os.remove(legacy_path)
+
+
+def _load_torch_model():
+    # transformers is imported here so that importing this module stays cheap
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, AutoConfig
+
+    timings = {}
+    # Check if local model exists
+    if os.path.exists(MODEL_DIR):
+        print("Loading model from local directory...")
+        if not os.path.exists(SAFETENSORS_PATH):
+            with _timed(timings, "convert"):
+                _convert_to_safetensors()
+        # Local files only (no hub lookups); safetensors weights are read
+        # memory-mapped and low_cpu_mem_usage skips the random init
+        with _timed(timings, "config"):
+            config = AutoConfig.from_pretrained(MODEL_DIR, local_files_only=True)
+        with _timed(timings, "tokenizer"):
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR, local_files_only=True)
+        with _timed(timings, "weights"):
+            model = AutoModelForSequenceClassification.from_pretrained(
+                MODEL_DIR, config=config, local_files_only=True,
+                use_safetensors=True, low_cpu_mem_usage=True,
+            )
+    else:
+        print("Downloading model from Hugging Face Hub...")
+        with _timed(timings, "download"):
+            model = AutoModelForSequenceClassification.from_pretrained(MODEL)
+            tokenizer = AutoTokenizer.from_pretrained(MODEL)
+            config = AutoConfig.from_pretrained(MODEL)
+
+        # Save locally for next time
+        with _timed(timings, "save"):
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            model.save_pretrained(MODEL_DIR, safe_serialization=True)
+            tokenizer.save_pretrained(MODEL_DIR)
+            config.save_pretrained(MODEL_DIR)
+
+    model.eval()
+    return SentimentModel(model, tokenizer, config, load_timings=timings)
+
+
+def _load_tokenizer_and_config():
+    from transformers import AutoTokenizer, AutoConfig
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR, local_files_only=True)
+    config = AutoConfig.from_pretrained(MODEL_DIR, local_files_only=True)
+    return tokenizer, config
+
+
+def export_onnx(sm, path=ONNX_PATH):
+    """Export a torch SentimentModel to ONNX with dynamic batch and sequence axes."""
+    print(f"Exporting sentiment model to {path}...")
+    dummy = sm.tokenizer(["export"], return_tensors='pt')
+    torch.onnx.export(
+        _LogitsOnly(sm.model),
+        (dummy['input_ids'], dummy['attention_mask']),
+        path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'logits': {0: 'batch'},
+        },
+        opset_version=14,
+    )
+
+
+def _load_onnx_model():
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("SENTIMENT_BACKEND=onnx requires the onnxruntime package") from e
+
+    # Export once from the torch weights; the torch model is dropped afterwards
+    if not os.path.exists(ONNX_PATH):
+        export_onnx(_load_torch_model())
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(ONNX_PATH, options, providers=["CPUExecutionProvider"])
+
+    tokenizer, config = _load_tokenizer_and_config()
+    return OnnxSentimentModel(session, tokenizer, config)
+
+
+def quantize_model(model):
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations fp32)."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_skeleton(config):
+    """Dynamically quantized model with uninitialised weights, ready for an int8 state dict.
+
+    Parameters are created on the meta device and every Linear is swapped for
+    an empty int8 one before anything gets real storage, so no fp32 Linear
+    weights are allocated or randomly initialised.
+    """
+    from transformers import AutoModelForSequenceClassification
+
+    with torch.device("meta"):
+        model = AutoModelForSequenceClassification.from_config(config)
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if type(child) is torch.nn.Linear:
+                setattr(module, name, torch.ao.nn.quantized.dynamic.Linear(
+                    child.in_features, child.out_features, bias_=child.bias is not None, dtype=torch.qint8))
+    return model.to_empty(device="cpu").eval()
+
+
+def _save_int8(model, path=QUANTIZED_PATH):
+    state_dict = model.state_dict()
+    # Non-persistent buffers (position ids etc.) aren't in the state dict,
+    # and the skeleton's copies are uninitialised
+    buffers = {name: buffer for name, buffer in model.named_buffers() if name not in state_dict}
+    torch.save({"state_dict": state_dict, "buffers": buffers}, path)
+
+
+def _load_int8_model():
+    # Quantize once from the fp32 weights and persist next to them
+    if not os.path.exists(QUANTIZED_PATH):
+        sm = _load_torch_model()
+        print(f"Quantizing sentiment model to {QUANTIZED_PATH}...")
+        sm.model = quantize_model(sm.model)
+        _save_int8(sm.model)
+        return sm
+
+    saved = torch.load(QUANTIZED_PATH)
+    if "buffers" not in saved:
+        print(f"{QUANTIZED_PATH} predates the current int8 format; quantizing again...")
+        os.remove(QUANTIZED_PATH)
+        return _load_int8_model()
+
+    # The fp32 checkpoint is never read
+    tokenizer, config = _load_tokenizer_and_config()
+    model = _quantized_skeleton(config)
+    model.load_state_dict(saved["state_dict"])
+    for name, buffer in saved["buffers"].items():
+        model.get_buffer(name).copy_(buffer)
+    return SentimentModel(model, tokenizer, config)
+
+
+def _load_student_model():
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    if not os.path.exists(STUDENT_DIR):
+        raise FileNotFoundError(
+            f"No distilled student model in {STUDENT_DIR}; train one with `python distill.py`"
+        )
+    print("Loading distilled student model...")
+    model = AutoModelForSequenceClassification.from_pretrained(
+        STUDENT_DIR, local_files_only=True, low_cpu_mem_usage=True,
+    )
+    tokenizer = AutoTokenizer.from_pretrained(STUDENT_DIR, local_files_only=True)
+    model.eval()
+    return SentimentModel(model, tokenizer, model.config)
+
+
+_LOADERS = {
+    "torch": _load_torch_model,
+    "onnx": _load_onnx_model,
+    "int8": _load_int8_model,
+    "student": _load_student_model,
+}
+_models = {}
+_model_lock = threading.Lock()
+
+
+def get_model(backend=None):
+    """Return the process-wide model for `backend`, loading it on first use.
+
+    Streamlit imports this module once per server process, so the module
+    global is shared by every session without an extra cache layer.
+    """
+    backend = backend or BACKEND
+    if backend not in _LOADERS:
+        raise ValueError(f"Unknown sentiment backend: {backend!r} (expected one of {sorted(_LOADERS)})")
+
+    if backend not in _models:
+        with _model_lock:
+            if backend not in _models:
+                start = time.perf_counter()
+                sm = _LOADERS[backend]()
+                sm.load_seconds = time.perf_counter() - start
+                stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in sm.load_timings.items())
+                print(f"Sentiment model ({backend}) loaded in {sm.load_seconds:.2f}s" + (f" ({stages})" if stages else ""))
+                _models[backend] = sm
+    return _models[backend]
+
+
+def load_report():
+    """Startup timings of every backend loaded in this process."""
+    return {
+        backend: {"total": sm.load_seconds, **sm.load_timings}
+        for backend, sm in _models.items()
+    }
+
+
+def model_load_seconds(backend=None):
+    """Seconds spent loading the model, or None if it has not been loaded yet."""
+    sm = _models.get(backend or BACKEND)
+    return sm.load_seconds if sm is not None else None
 
-# Check if local model exists
-if os.path.exists(MODEL_DIR):
-    print("Loading model from local directory...")
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-    config = AutoConfig.from_pretrained(MODEL_DIR)
-else:
-    print("Downloading model from Hugging Face Hub...")
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL)
-    tokenizer = AutoTokenizer.from_pretrained(MODEL)
-    config = AutoConfig.from_pretrained(MODEL)
-    
-    # Save locally for next time
-    os.makedirs(MODEL_DIR, exist_ok=True)
-    model.save_pretrained(MODEL_DIR)
-    tokenizer.save_pretrained(MODEL_DIR)
-    config.save_pretrained(MODEL_DIR)
 
 # Preprocess text (username and link placeholders)
 def preprocess(text):
-    new_text = []
-    for t in text.split(" "):
-        t = '@user' if t.startswith('@') and len(t) > 1 else t
-        t = 'http' if t.startswith('http') else t
-        new_text.append(t)
-    return " ".join(new_text)
-
-def predict_sentiment(text):
-    processed_text = preprocess(text)
-    encoded_input = tokenizer(processed_text, return_tensors='pt')
-    output = model(**encoded_input)
-    probs = F.softmax(output.logits, dim=1)
-    index_of_sentiment = probs.argmax().item()
-    sentiment = config.id2label[index_of_sentiment]
-    score = probs[0, index_of_sentiment].item()
-    
+    return mask_text(text)
+
+
+_long_text_counts = {"truncated": 0, "chunked": 0}
+_long_text_lock = threading.Lock()
+
+
+def long_text_counts():
+    """How many inputs this process has truncated or chunked so far."""
+    with _long_text_lock:
+        return dict(_long_text_counts)
+
+
+def _encode(sm, processed_texts):
+    """Tokenize without padding, applying the long-text policy.
+
+    Returns the encoding (one entry per window) and, for every window, the
+    index of the text it came from.
+    """
+    max_length = min(MAX_LENGTH, sm.tokenizer.model_max_length)
+    encoded = sm.tokenizer(
+        processed_texts,
+        truncation=True,
+        max_length=max_length,
+        stride=CHUNK_STRIDE,
+        return_overflowing_tokens=True,
+    )
+    owner = np.asarray(encoded.pop('overflow_to_sample_mapping'))
+    encoded = {key: encoded[key] for key in encoded.keys()}
+    long_texts = int((np.bincount(owner, minlength=len(processed_texts)) > 1).sum())
+
+    if LONG_TEXT_MODE == "chunk":
+        counter = "chunked"
+    else:
+        # Keep only the first window of each text, i.e. plain truncation
+        keep = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        encoded = {key: [values[j] for j in keep] for key, values in encoded.items()}
+        owner = owner[keep]
+        counter = "truncated"
+
+    if long_texts:
+        with _long_text_lock:
+            _long_text_counts[counter] += long_texts
+    return encoded, owner
+
+
+_stage_seconds = {"tokenize": 0.0, "forward": 0.0, "queue_wait": 0.0}
+_stage_lock = threading.Lock()
+
+
+def _add_stage_time(stage, seconds):
+    with _stage_lock:
+        _stage_seconds[stage] += seconds
+
+
+def stage_timings():
+    """Cumulative seconds spent tokenizing, in forward passes, and (pipelined
+    mode only) waiting for the tokenizer thread to hand over a batch."""
+    with _stage_lock:
+        return dict(_stage_seconds)
+
+
+def _pad(sm, encoded, idx):
+    return sm.tokenizer.pad(
+        {key: [values[i] for i in idx] for key, values in encoded.items()},
+        padding=True,
+        return_tensors='pt',
+    )
+
+
+def _sorted_batches(sm, processed_texts, batch_size):
+    """Yield (owner, lengths, padded batch) per batch of windows.
+
+    Tokenizes everything up front, then sorts windows by token length so
+    every batch is padded only up to its own longest member.
+    """
+    start = time.perf_counter()
+    encoded, owner = _encode(sm, processed_texts)
+    lengths = np.array([len(ids) for ids in encoded['input_ids']])
+    order = np.argsort(lengths, kind='stable')
+    _add_stage_time("tokenize", time.perf_counter() - start)
+
+    for begin in range(0, len(order), batch_size):
+        idx = order[begin:begin + batch_size]
+        start = time.perf_counter()
+        batch = _pad(sm, encoded, idx)
+        _add_stage_time("tokenize", time.perf_counter() - start)
+        yield owner[idx], lengths[idx], batch
+
+
+def _pipelined_batches(sm, processed_texts, batch_size):
+    """Same contract as _sorted_batches, but a tokenizer thread encodes the
+    next batch while the caller runs the model on the current one.
+
+    Token lengths aren't known before tokenizing, so texts are ordered by
+    character length instead.
+    """
+    order = np.argsort([len(text) for text in processed_texts], kind='stable')
+    ready = queue.Queue(maxsize=PIPELINE_DEPTH)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for begin in range(0, len(order), batch_size):
+                if stop.is_set():
+                    return
+                idx = order[begin:begin + batch_size]
+                start = time.perf_counter()
+                encoded, owner = _encode(sm, [processed_texts[i] for i in idx])
+                lengths = np.array([len(ids) for ids in encoded['input_ids']])
+                batch = _pad(sm, encoded, range(len(owner)))
+                _add_stage_time("tokenize", time.perf_counter() - start)
+                ready.put((idx[owner], lengths, batch))
+            ready.put(None)
+        except Exception as e:
+            ready.put(e)
+
+    producer = threading.Thread(target=produce, name="sentiment-tokenizer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            start = time.perf_counter()
+            item = ready.get()
+            _add_stage_time("queue_wait", time.perf_counter() - start)
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        while producer.is_alive():
+            try:
+                ready.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+
+
+def _batch_probs(sm, processed_texts, batch_size=BATCH_SIZE):
+    """Return an (n, num_labels) array of class probabilities for preprocessed texts."""
+    num_labels = sm.config.num_labels
+    probs = np.zeros((len(processed_texts), num_labels), dtype=np.float32)
+    if not processed_texts:
+        return probs
+
+    batches = _pipelined_batches if PIPELINE else _sorted_batches
+    weights = np.zeros(len(processed_texts), dtype=np.float32)
+    with torch.inference_mode():
+        for owner, lengths, batch in batches(sm, processed_texts, batch_size):
+            start = time.perf_counter()
+            window_probs = F.softmax(sm.logits(batch), dim=1).numpy()
+            _add_stage_time("forward", time.perf_counter() - start)
+
+            # Average window probabilities per text, weighted by window length
+            np.add.at(probs, owner, window_probs * lengths[:, None])
+            np.add.at(weights, owner, lengths)
+
+    return probs / weights[:, None]
+
+
+def _batch_probs_and_embeddings(sm, processed_texts, batch_size=BATCH_SIZE):
+    """Sentiment probabilities and mean-pooled encoder states from one forward pass.
+
+    Returns (n, num_labels) probabilities, matching _batch_probs, and
+    (n, hidden_size) embeddings of the last encoder layer, so other heads can
+    share the pass. Needs a transformers model (torch or int8 backend).
+    Windows of chunked texts are averaged the same way for both.
+    """
+    encoder, classifier = sm.model.base_model, sm.model.classifier
+    probs = np.zeros((len(processed_texts), sm.config.num_labels), dtype=np.float32)
+    embeddings = np.zeros((len(processed_texts), sm.config.hidden_size), dtype=np.float32)
+    if not processed_texts:
+        return probs, embeddings
+
+    batches = _pipelined_batches if PIPELINE else _sorted_batches
+    weights = np.zeros(len(processed_texts), dtype=np.float32)
+    with torch.inference_mode():
+        for owner, lengths, batch in batches(sm, processed_texts, batch_size):
+            start = time.perf_counter()
+            hidden = encoder(**batch).last_hidden_state
+            # The classification head reads the <s> token state itself
+            window_probs = F.softmax(classifier(hidden), dim=1).numpy()
+            mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            window_embeddings = ((hidden * mask).sum(dim=1) / mask.sum(dim=1)).numpy()
+            _add_stage_time("forward", time.perf_counter() - start)
+
+            np.add.at(probs, owner, window_probs * lengths[:, None])
+            np.add.at(embeddings, owner, window_embeddings * lengths[:, None])
+            np.add.at(weights, owner, lengths)
+
+    return probs / weights[:, None], embeddings / weights[:, None]
+
+
+_cache = None
+
+
+def get_cache():
+    """Return the process-wide sentiment result cache, or None if disabled."""
+    global _cache
+    if _cache is None and CACHE_PATH:
+        _cache = SQLiteCache(CACHE_PATH, table="sentiment", max_entries=CACHE_MAX_ENTRIES)
+    return _cache
+
+
+def cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache is not None else None
+
+
+# Weights file each backend scores with (first one that exists)
+_ARTIFACTS = {
+    "torch": [SAFETENSORS_PATH],
+    "onnx": [ONNX_PATH],
+    "int8": [QUANTIZED_PATH],
+    "student": [os.path.join(STUDENT_DIR, "model.safetensors"), os.path.join(STUDENT_DIR, "pytorch_model.bin")],
+}
+
+
+def _artifact_id(backend):
+    # Re-exported, re-quantized or re-distilled weights get a new mtime/size
+    for path in _ARTIFACTS.get(backend, []):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    return "missing"
+
+
+def _model_id(backend):
+    # Backends, their artifacts and long-text policies produce different scores
+    return f"{MODEL}:{backend}:{_artifact_id(backend)}:{LONG_TEXT_MODE}:{MAX_LENGTH}:{CHUNK_STRIDE}"
+
+
+def _cache_key(processed_text, backend, model_id=None):
+    model_id = model_id or _model_id(backend)
+    return hashlib.sha256(f"{model_id}\0{processed_text}".encode("utf-8")).hexdigest()
+
+
+def _probs_with_cache(processed_texts, backend, score_missing):
+    """Probabilities for preprocessed texts, running `score_missing` only on cache misses.
+
+    Duplicate texts within one call are scored once as well.
+    """
+    backend = backend or BACKEND
+    if not processed_texts:
+        return np.zeros((0, len(LABELS)), dtype=np.float32)
+
+    cache = get_cache()
+    unique_texts = list(dict.fromkeys(processed_texts))
+    model_id = _model_id(backend)
+    keys = {text: _cache_key(text, backend, model_id) for text in unique_texts}
+    cached = cache.get_many(keys.values()) if cache is not None else {}
+
+    by_text = {
+        text: np.asarray(cached[keys[text]], dtype=np.float32)
+        for text in unique_texts if keys[text] in cached
+    }
+    missing = [text for text in unique_texts if text not in by_text]
+    if missing:
+        missing_probs = score_missing(missing)
+        by_text.update(zip(missing, missing_probs))
+        if cache is not None:
+            cache.set_many({keys[text]: by_text[text].tolist() for text in missing})
+
+    return np.stack([by_text[text] for text in processed_texts])
+
+
+def labels_from_probs(probs, min_confidence=0.0):
+    """Label and score (probability of that label) for each row of a probability array.
+
+    Rows whose top probability is below `min_confidence` are labelled neutral,
+    so thresholds can be changed without re-running the model.
+    """
+    probs = np.asarray(probs, dtype=np.float32).reshape(-1, len(LABELS))
+    best = probs.argmax(axis=1)
+    if min_confidence:
+        best = np.where(probs.max(axis=1) < min_confidence, LABELS.index("neutral"), best)
+    labels = np.array(LABELS, dtype=object)[best]
+    scores = probs[np.arange(len(best)), best]
+    return labels, scores
+
+
+def predict_sentiment_probs(texts, batch_size=BATCH_SIZE, backend=None, workers=1):
+    """(n, 3) array of negative/neutral/positive probabilities aligned with `texts`.
+
+    With workers > 1 cache misses are scored by predict_sentiment_parallel's
+    process pool instead of in-process.
+    """
+    processed_texts = mask_texts(texts)
+    return _probs_with_cache(
+        processed_texts, backend,
+        lambda missing: _parallel_probs(missing, workers, batch_size, backend),
+    )
+
+
+def predict_sentiment_batch(texts, batch_size=BATCH_SIZE, backend=None):
+    """Score many texts at once; returns (labels, scores) arrays aligned with `texts`."""
+    return labels_from_probs(predict_sentiment_probs(texts, batch_size=batch_size, backend=backend))
+
+def predict_sentiment(text, backend=None):
+    labels, scores = predict_sentiment_batch([text], batch_size=1, backend=backend)
+    sentiment = labels[0]
+    score = float(scores[0])
+
     return sentiment, score
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker(threads, backend):
+    # Split the cores between workers so their intra-op pools don't fight
+    torch.set_num_threads(threads)
+    # Already present after fork; loads a private copy under forkserver/spawn
+    get_model(backend)
+
+
+def _score_shard(args):
+    processed_texts, batch_size, backend = args
+    return _batch_probs(get_model(backend), processed_texts, batch_size=batch_size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _worker_pool(workers, backend):
+    """Process pool for `workers` and `backend`, created on first use and then reused."""
+    with _pools_lock:
+        pool = _pools.get((workers, backend))
+        if pool is None:
+            methods = mp.get_all_start_methods()
+            # Forking while other threads run (the governor, Streamlit sessions,
+            # the tokenizer pipeline) can copy a held lock into the child and
+            # hang it, so fork only from a single-threaded process
+            if "fork" in methods and threading.active_count() == 1:
+                # Load before forking so the workers share the weights copy-on-write
+                get_model(backend)
+                ctx = mp.get_context("fork")
+            else:
+                ctx = mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+            threads = max(1, available_cores() // workers)
+            pool = ctx.Pool(workers, initializer=_init_worker, initargs=(threads, backend))
+            _pools[(workers, backend)] = pool
+    return pool
+
+
+def _parallel_probs(processed_texts, workers, batch_size, backend):
+    if workers <= 1 or len(processed_texts) < workers * batch_size:
+        return _batch_probs(get_model(backend), processed_texts, batch_size=batch_size)
+
+    shards = [list(shard) for shard in np.array_split(np.array(processed_texts, dtype=object), workers)]
+    # map() returns shard results in submission order
+    results = _worker_pool(workers, backend).map(_score_shard, [(shard, batch_size, backend) for shard in shards])
+    return np.concatenate(results)
+
+
+def predict_sentiment_parallel(texts, workers=None, batch_size=BATCH_SIZE, backend=None):
+    """predict_sentiment_batch sharded across a process pool, results in input order.
+
+    The cache is consulted in the parent so only misses are shipped to the
+    workers. Falls back to in-process scoring when one worker is configured
+    or the input is too small to be worth the pool start-up.
+    """
+    probs = predict_sentiment_probs(texts, batch_size=batch_size, backend=backend, workers=workers or WORKERS)
+    return labels_from_probs(probs)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Return the process-wide MicroBatcher that all governed scoring goes through.
+
+    Created on first use, when torch's intra-op pool is sized so that
+    MAX_CONCURRENT batches together use the available cores.
+    """
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                torch.set_num_threads(max(1, available_cores() // MAX_CONCURRENT))
+                _governor = MicroBatcher(
+                    lambda texts: (predict_sentiment_probs(texts, workers=WORKERS),),
+                    max_batch_size=GOVERNOR_MAX_BATCH,
+                    max_wait_ms=GOVERNOR_MAX_WAIT_MS,
+                    concurrency=MAX_CONCURRENT,
+                )
+    return _governor
+
+
+def governed_probs(texts):
+    """predict_sentiment_probs with the configured workers, via the governor when enabled.
+
+    Use this from code that may run in several Streamlit sessions at once.
+    """
+    if not GOVERNOR:
+        return predict_sentiment_probs(texts, workers=WORKERS)
+    (probs,) = get_governor().score(texts)
+    return probs
+
+
+def governor_stats():
+    """Queue depth, batch sizes and wait times, or None before first use."""
+    return _governor.stats() if _governor is not None else None
@@ -0,0 +1,105 @@
+"""Text normalization shared by the scoring pipeline and the dashboard.
+
+Run `python text_clean.py [n]` to benchmark against the original
+implementations on n synthetic tweets (default 100k).
+"""
+import re
+
+# Same rules as the per-token loop that sentiment.preprocess used to run: a
+# space-separated token starting with '@' (longer than one character) becomes
+# '@user' and one starting with 'http' becomes 'http'. The patterns start
+# with a literal so the regex engine can skip ahead to candidate positions;
+# the lookbehind then checks the match begins a token.
+USER_RE = re.compile(r'@(?<![^ ]@)[^ ]+')
+URL_TOKEN_RE = re.compile(r'http(?<![^ ]http)[^ ]*')
+
+# Word-cloud cleaning rules from the Content Analysis tab
+URL_RE = re.compile(r'http\S+')
+EMAIL_RE = re.compile(r'\S*@\S*\s?')
+PUNCT_RE = re.compile(r'[^\w\s]')
+DIGITS_RE = re.compile(r'\d+')
+
+
+def mask_text(text):
+    """Replace user handles and links in one string with placeholders."""
+    if '@' not in text and 'http' not in text:
+        return text
+    return URL_TOKEN_RE.sub('http', USER_RE.sub('@user', text))
+
+
+def mask_texts(texts):
+    return [mask_text(str(text)) for text in texts]
+
+
+def clean_text(text):
+    """Strip links, emails/handles, punctuation and digits, and lowercase."""
+    text = URL_RE.sub('', text)
+    text = EMAIL_RE.sub('', text)
+    text = PUNCT_RE.sub('', text)
+    return DIGITS_RE.sub('', text).lower()
+
+
+def clean_joined(series):
+    """All texts in `series` cleaned into one space-joined string (word-cloud input).
+
+    The same passes the Content Analysis tab used to run inline; cleaning
+    the joined string once is cheaper than cleaning row by row.
+    """
+    return clean_text(' '.join(series.fillna('').astype(str)))
+
+
+def _preprocess_loop(text):
+    # The original per-string implementation, kept as the benchmark baseline
+    new_text = []
+    for t in text.split(" "):
+        t = '@user' if t.startswith('@') and len(t) > 1 else t
+        t = 'http' if t.startswith('http') else t
+        new_text.append(t)
+    return " ".join(new_text)
+
+
+def _clean_joined(texts):
+    # The original word-cloud cleaning over one joined string
+    all_text = ' '.join(texts)
+    all_text = re.sub(r'http\S+', '', all_text)
+    all_text = re.sub(r'\S*@\S*\s?', '', all_text)
+    all_text = re.sub(r'[^\w\s]', '', all_text)
+    all_text = re.sub(r'\d+', '', all_text)
+    return all_text.lower()
+
+
+def _benchmark(n):
+    import random
+    import time
+    import pandas as pd
+    from sample_tweets import sample_texts
+
+    rng = random.Random(0)
+    base = sample_texts()
+    texts = [
+        f"{rng.choice(base)} @user{rng.randint(0, 999)} https://t.co/{rng.randint(0, 10**6):x}"
+        for _ in range(n)
+    ]
+    series = pd.Series(texts, dtype=object)
+
+    def timed(fn):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+    loop_masked, loop_secs = timed(lambda: [_preprocess_loop(t) for t in texts])
+    new_masked, new_secs = timed(lambda: mask_texts(texts))
+    assert loop_masked == new_masked, "masking results differ"
+    print(f"Masking {n} tweets: loop {loop_secs:.3f}s, mask_texts {new_secs:.3f}s "
+          f"({loop_secs / new_secs:.2f}x)")
+
+    old_clean, old_secs = timed(lambda: _clean_joined(texts))
+    new_clean, new_secs = timed(lambda: clean_joined(series))
+    assert old_clean.split() == new_clean.split(), "cleaning results differ"
+    print(f"Cleaning {n} tweets: inline passes {old_secs:.3f}s, clean_joined {new_secs:.3f}s "
+          f"({old_secs / new_secs:.2f}x)")
+
+
+if __name__ == "__main__":
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)